@@ -2,8 +2,17 @@
 FastAPI TODO Application Package
 """
 
+import os
+
+from dotenv import load_dotenv
+
 __version__ = "0.1.0"
 
+# Load .env once for the whole package (and any reloader/worker re-imports)
+if not os.environ.get("_DOTENV_LOADED"):
+    load_dotenv()
+    os.environ["_DOTENV_LOADED"] = "1"
+
 
 def main() -> None:
     """Main entry point for the application"""
@@ -39,7 +39,7 @@ security = HTTPBearer()
 async def register_user(user_data: UserCreate):
     """Register a new user"""
     # Hash the password
-    hashed_password = security_manager.hash_password(user_data.password)
+    hashed_password = await security_manager.hash_password(user_data.password)
     
     # In a real implementation, you would save this to a database
     # For now, return success response
@@ -8,10 +8,6 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
 from urllib.parse import quote_plus
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
 
 # PostgreSQL Database URL
 DATABASE_URL = os.getenv("POSTGRES_DATABASE_URL")
@@ -4,6 +4,7 @@ Enhanced Todo API endpoints with comprehensive Pydantic model integration
 
 from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, Query, status, Body
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import math
 
@@ -49,8 +50,9 @@ async def get_todos(
         tags=tags.split(",") if tags else None,
     )
 
-    todos = TodoService.get_todos(db, skip=skip, limit=limit, filters=filters)
-    total = TodoService.get_todos_count(db, filters=filters)
+    todos, total = await run_in_threadpool(
+        TodoService.list_and_count, db, skip, limit, filters
+    )
 
     # Calculate total pages
     total_pages = math.ceil(total / limit) if total > 0 else 0
@@ -169,8 +171,9 @@ async def search_todos(
     db: Session = Depends(get_db),
 ):
     """Advanced search for todos using comprehensive filter model"""
-    todos = TodoService.get_todos(db, skip=skip, limit=limit, filters=filters)
-    total = TodoService.get_todos_count(db, filters=filters)
+    todos, total = await run_in_threadpool(
+        TodoService.list_and_count, db, skip, limit, filters
+    )
 
     # Calculate total pages
     total_pages = math.ceil(total / limit) if total > 0 else 0
@@ -9,10 +9,6 @@ from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import QueuePool
 from typing import Generator
 from urllib.parse import quote_plus
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
 
 # PostgreSQL Database URL for TODOs
 # Use a separate database or schema for TODOs
@@ -2,10 +2,50 @@
 SQLAlchemy database models with enhanced fields to support Pydantic models
 """
 
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, Text, JSON
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Integer,
+    JSON,
+    SmallInteger,
+    String,
+    Text,
+)
 from sqlalchemy.sql import func
+from sqlalchemy.types import TypeDecorator
 
 from ..db.database import Base
+from ..schemas.todo import TodoPriority, TodoStatus
+
+
+class EnumInt(TypeDecorator):
+    """
+    Store a str-valued Enum as a compact SmallInteger code
+
+    Codes follow the Enum declaration order, so new members must be appended.
+    Bound values may be Enum members or their string values.
+    """
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_cls, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.enum_cls = enum_cls
+        self.codes = {member: code for code, member in enumerate(enum_cls)}
+        self.codes.update({member.value: code for member, code in self.codes.items()})
+        self.members = list(enum_cls)
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return self.codes[value]
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self.members[value]
 
 
 class Todo(Base):
@@ -21,8 +61,15 @@ class Todo(Base):
     completed = Column(Boolean, default=False, nullable=False, index=True)
 
     # Enhanced fields
-    priority = Column(String(20), default="medium", nullable=False, index=True)
-    status = Column(String(20), default="pending", nullable=False, index=True)
+    priority = Column(
+        EnumInt(TodoPriority),
+        default=TodoPriority.MEDIUM,
+        nullable=False,
+        index=True,
+    )
+    status = Column(
+        EnumInt(TodoStatus), default=TodoStatus.PENDING, nullable=False, index=True
+    )
     due_date = Column(DateTime(timezone=True), nullable=True, index=True)
     tags = Column(JSON, default=list, nullable=False)  # Store tags as JSON array
 
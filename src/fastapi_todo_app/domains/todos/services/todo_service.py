@@ -2,7 +2,7 @@
 Enhanced Todo service layer with comprehensive business logic using Pydantic models
 """
 
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func
@@ -24,8 +24,49 @@ class TodoService:
 
     @staticmethod
     def get_todo_by_id(db: Session, todo_id: int) -> Optional[Todo]:
-        """Get a todo by its ID"""
-        return db.query(Todo).filter(Todo.id == todo_id).first()
+        """Get a todo by its ID (served from the identity map when already loaded)"""
+        return db.get(Todo, todo_id)
+
+    @staticmethod
+    def _apply_filters(query, filters: Optional[TodoFilter]):
+        """Apply the Pydantic filter model to a Todo query"""
+        if not filters:
+            return query
+
+        if filters.completed is not None:
+            query = query.filter(Todo.completed == filters.completed)
+
+        if filters.priority is not None:
+            query = query.filter(Todo.priority == filters.priority.value)
+
+        if filters.status is not None:
+            query = query.filter(Todo.status == filters.status.value)
+
+        if filters.tags:
+            # Filter by tags (JSON contains any of the specified tags)
+            tag_conditions = []
+            for tag in filters.tags:
+                tag_conditions.append(
+                    func.json_extract(Todo.tags, "$[*]").like(f"%{tag}%")
+                )
+            query = query.filter(or_(*tag_conditions))
+
+        if filters.due_before:
+            query = query.filter(Todo.due_date <= filters.due_before)
+
+        if filters.due_after:
+            query = query.filter(Todo.due_date >= filters.due_after)
+
+        if filters.search:
+            search_term = f"%{filters.search}%"
+            query = query.filter(
+                or_(
+                    Todo.title.ilike(search_term),
+                    Todo.description.ilike(search_term),
+                )
+            )
+
+        return query
 
     @staticmethod
     def get_todos(
@@ -35,42 +76,7 @@ class TodoService:
         filters: Optional[TodoFilter] = None,
     ) -> List[Todo]:
         """Get todos with enhanced filtering using Pydantic filter model"""
-        query = db.query(Todo)
-
-        if filters:
-            # Apply filters based on Pydantic model
-            if filters.completed is not None:
-                query = query.filter(Todo.completed == filters.completed)
-
-            if filters.priority is not None:
-                query = query.filter(Todo.priority == filters.priority.value)
-
-            if filters.status is not None:
-                query = query.filter(Todo.status == filters.status.value)
-
-            if filters.tags:
-                # Filter by tags (JSON contains any of the specified tags)
-                tag_conditions = []
-                for tag in filters.tags:
-                    tag_conditions.append(
-                        func.json_extract(Todo.tags, "$[*]").like(f"%{tag}%")
-                    )
-                query = query.filter(or_(*tag_conditions))
-
-            if filters.due_before:
-                query = query.filter(Todo.due_date <= filters.due_before)
-
-            if filters.due_after:
-                query = query.filter(Todo.due_date >= filters.due_after)
-
-            if filters.search:
-                search_term = f"%{filters.search}%"
-                query = query.filter(
-                    or_(
-                        Todo.title.ilike(search_term),
-                        Todo.description.ilike(search_term),
-                    )
-                )
+        query = TodoService._apply_filters(db.query(Todo), filters)
 
         # Order by created_at descending by default
         query = query.order_by(Todo.created_at.desc())
@@ -80,43 +86,24 @@ class TodoService:
     @staticmethod
     def get_todos_count(db: Session, filters: Optional[TodoFilter] = None) -> int:
         """Get total count of todos with filtering"""
-        query = db.query(Todo)
-
-        if filters:
-            # Apply the same filters as in get_todos
-            if filters.completed is not None:
-                query = query.filter(Todo.completed == filters.completed)
-
-            if filters.priority is not None:
-                query = query.filter(Todo.priority == filters.priority.value)
-
-            if filters.status is not None:
-                query = query.filter(Todo.status == filters.status.value)
-
-            if filters.tags:
-                tag_conditions = []
-                for tag in filters.tags:
-                    tag_conditions.append(
-                        func.json_extract(Todo.tags, "$[*]").like(f"%{tag}%")
-                    )
-                query = query.filter(or_(*tag_conditions))
-
-            if filters.due_before:
-                query = query.filter(Todo.due_date <= filters.due_before)
-
-            if filters.due_after:
-                query = query.filter(Todo.due_date >= filters.due_after)
-
-            if filters.search:
-                search_term = f"%{filters.search}%"
-                query = query.filter(
-                    or_(
-                        Todo.title.ilike(search_term),
-                        Todo.description.ilike(search_term),
-                    )
-                )
+        return TodoService._apply_filters(db.query(Todo), filters).count()
 
-        return query.count()
+    @staticmethod
+    def list_and_count(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        filters: Optional[TodoFilter] = None,
+    ) -> Tuple[List[Todo], int]:
+        """
+        Get a page of todos and the total match count in one call
+
+        Both queries run on the same Session transaction so routes can offload
+        them with a single threadpool hop.
+        """
+        todos = TodoService.get_todos(db, skip=skip, limit=limit, filters=filters)
+        total = TodoService.get_todos_count(db, filters=filters)
+        return todos, total
 
     @staticmethod
     def create_todo(db: Session, todo: TodoCreate) -> Todo:
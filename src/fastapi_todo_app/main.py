@@ -21,10 +21,10 @@ from .domains.todos.db.database import (
 from .domains.employees.db.database import (
     create_tables as create_employee_tables,
 )  # PostgreSQL for Employees
-from .domains.todos.schemas.todo import TodoStats
 
 # Import optimization features
 from .shared.database.async_db import initialize_databases, close_databases
+from .shared.exceptions import ErrorJSONResponse
 from .shared.utils.caching import cache_service
 from .shared.utils.rate_limiting import rate_limit_service
 
@@ -34,6 +34,8 @@ from .shared.monitoring.observability import (
     ObservabilityMiddleware,
     metrics_collector,
     alert_manager,
+    start_log_listener,
+    stop_log_listener,
 )
 from .shared.features.advanced_api import advanced_api_service
 
@@ -61,6 +63,12 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Starting FastAPI TODO & Employee Application with optimizations")
     try:
+        # Start background writer for queued request/metrics logs
+        start_log_listener()
+
+        # Start periodic system metrics collection
+        await metrics_collector.start()
+
         # Create PostgreSQL tables for TODOs
         create_todo_tables()
         logger.info("✅ PostgreSQL TODO tables created successfully")
@@ -117,11 +125,19 @@ async def lifespan(app: FastAPI):
         await task_manager.stop()
         logger.info("✅ Background task manager stopped")
 
+        # Stop system metrics collection
+        await metrics_collector.stop()
+
+        # Stop the idle rate limiter sweeper thread
+        rate_limit_service.stop_sweeper()
+
         # Close database connections
         await close_databases()
         logger.info("✅ Database connections closed")
     except Exception as e:
         logger.error(f"❌ Error during shutdown: {e}")
+    finally:
+        stop_log_listener()
 
 
 def create_application() -> FastAPI:
@@ -183,11 +199,7 @@ def create_application() -> FastAPI:
         DatabaseMetricsMiddleware,
         CacheMetricsMiddleware,
     )
-    from .shared.utils.rate_limiting import (
-        rate_limit_service,
-        RateLimit,
-        RateLimitStrategy,
-    )
+    from .shared.utils.rate_limiting import RateLimit, RateLimitStrategy
 
     # Performance monitoring middleware
     app.add_middleware(
@@ -257,7 +269,7 @@ def create_application() -> FastAPI:
         request: Request, exc: RequestValidationError
     ):
         """Handle Pydantic validation errors"""
-        return JSONResponse(
+        return ErrorJSONResponse(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             content={
                 "detail": "Validation Error",
@@ -271,7 +283,7 @@ def create_application() -> FastAPI:
         request: Request, exc: ValidationError
     ):
         """Handle Pydantic model validation errors"""
-        return JSONResponse(
+        return ErrorJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={
                 "detail": "Pydantic Validation Error",
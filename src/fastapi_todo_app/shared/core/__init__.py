@@ -1,5 +1,15 @@
 """Shared Core Configuration Package"""
 
-from .config import settings
+from typing import Any
 
-__all__ = ["settings"]
\ No newline at end of file
+from .config import Settings, get_settings
+
+
+def __getattr__(name: str) -> Any:
+    """Defer building ``settings`` until it is first accessed"""
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["Settings", "get_settings", "settings"]
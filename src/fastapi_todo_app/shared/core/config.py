@@ -3,11 +3,16 @@ Application configuration settings
 """
 
 import os
+import re
+from functools import cached_property, lru_cache
 from typing import Any, Dict, List, Optional, Union
 
 from pydantic import AnyHttpUrl, field_validator, model_validator
 from pydantic_settings import BaseSettings
 
+# Split a comma-separated list and trim surrounding whitespace in one pass
+_CORS_SPLIT = re.compile(r"\s*,\s*").split
+
 
 class Settings(BaseSettings):
     """
@@ -34,12 +39,17 @@ class Settings(BaseSettings):
         "http://localhost:3000,http://localhost:8000,http://localhost:8080"
     )
 
-    def get_cors_origins(self) -> List[str]:
-        """Get CORS origins as a list"""
+    @cached_property
+    def cors_origins(self) -> List[str]:
+        """CORS origins parsed once from BACKEND_CORS_ORIGINS"""
         if isinstance(self.BACKEND_CORS_ORIGINS, str):
-            return [origin.strip() for origin in self.BACKEND_CORS_ORIGINS.split(",")]
+            return _CORS_SPLIT(self.BACKEND_CORS_ORIGINS.strip())
         return self.BACKEND_CORS_ORIGINS
 
+    def get_cors_origins(self) -> List[str]:
+        """Get CORS origins as a list"""
+        return self.cors_origins
+
     # Database
     DATABASE_URL: Optional[str] = None
     SQLITE_DATABASE_URL: str = "sqlite:///./todo_app.db"
@@ -109,4 +119,18 @@ class Settings(BaseSettings):
     APP_NAME: str = "FastAPI TODO & Employee Management System"
 
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Build the application settings on first use and reuse them afterwards"""
+    return Settings()
+
+
+def __getattr__(name: str) -> Any:
+    """Resolve ``settings`` lazily so importing this module skips .env parsing"""
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# "settings" is supplied by the module __getattr__ above
+__all__ = ["Settings", "get_settings", "settings"]  # noqa: F822
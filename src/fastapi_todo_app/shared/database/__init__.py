@@ -9,10 +9,9 @@ from sqlalchemy.pool import QueuePool
 from urllib.parse import quote_plus
 import os
 from typing import Generator
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+# Resolve SQL echo flag once at import
+_SQL_DEBUG = os.getenv("SQL_DEBUG", "false").lower() == "true"
 
 # Create Base class for all models
 Base = declarative_base()
@@ -27,7 +26,7 @@ def create_database_engine(database_url: str, pool_size: int = 5, max_overflow:
         max_overflow=max_overflow,
         pool_pre_ping=True,
         pool_recycle=3600,
-        echo=os.getenv("SQL_DEBUG", "false").lower() == "true",
+        echo=_SQL_DEBUG,
     )
 
 
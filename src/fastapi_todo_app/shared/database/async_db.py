@@ -2,21 +2,24 @@
 Async database utilities and connection management
 """
 
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import (
     create_async_engine, 
     AsyncSession, 
     async_sessionmaker
 )
-from sqlalchemy.pool import QueuePool
 from contextlib import asynccontextmanager
 import logging
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, Callable, Optional
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Resolve SQL echo flag once at import
+_SQL_DEBUG = os.getenv("SQL_DEBUG", "false").lower() == "true"
+
+# Connectivity probe, built once and reused by every health check
+_HEALTH_STMT = text("SELECT 1")
+
 
 class AsyncDatabaseManager:
     """Async database connection manager with enhanced features"""
@@ -29,8 +32,7 @@ class AsyncDatabaseManager:
         # Configure connection pool for optimal performance
         self.engine = create_async_engine(
             database_url,
-            echo=echo or os.getenv("SQL_DEBUG", "false").lower() == "true",
-            poolclass=QueuePool,
+            echo=echo or _SQL_DEBUG,
             pool_size=10,          # Number of connections to maintain
             max_overflow=20,       # Additional connections when pool is full
             pool_pre_ping=True,    # Validate connections before use
@@ -50,12 +52,12 @@ class AsyncDatabaseManager:
         async with self.async_session_factory() as session:
             try:
                 yield session
-                await session.commit()
+                # Skip the COMMIT round-trip when the session never began a transaction
+                if session.in_transaction():
+                    await session.commit()
             except Exception:
                 await session.rollback()
                 raise
-            finally:
-                await session.close()
     
     def get_session_no_commit(self) -> AsyncSession:
         """Get async session without auto-commit (for manual transaction control)"""
@@ -64,8 +66,8 @@ class AsyncDatabaseManager:
     async def health_check(self) -> bool:
         """Check database connectivity"""
         try:
-            async with self.get_session() as session:
-                await session.execute("SELECT 1")
+            async with self.engine.connect() as conn:
+                await conn.execute(_HEALTH_STMT)
                 return True
         except Exception as e:
             logger.error(f"Database health check failed: {e}")
@@ -88,22 +90,27 @@ class AsyncDatabaseManager:
 
 
 # Database dependency injection
-async def get_async_todos_session() -> AsyncGenerator[AsyncSession, None]:
-    """Dependency for getting todos database session"""
-    if not todos_db:
-        raise RuntimeError("Todos database not initialized")
-    
-    async with todos_db.get_session() as session:
-        yield session
+def make_session_dependency(
+    get_manager: Callable[[], Optional[AsyncDatabaseManager]], name: str
+) -> Callable[[], AsyncGenerator[AsyncSession, None]]:
+    """Build a FastAPI session dependency bound to a lazily-resolved manager"""
 
+    async def get_session() -> AsyncGenerator[AsyncSession, None]:
+        manager = get_manager()
+        if manager is None:
+            raise RuntimeError(f"{name} database not initialized")
 
-async def get_async_employees_session() -> AsyncGenerator[AsyncSession, None]:
-    """Dependency for getting employees database session"""
-    if not employees_db:
-        raise RuntimeError("Employees database not initialized")
-    
-    async with employees_db.get_session() as session:
-        yield session
+        async with manager.get_session() as session:
+            yield session
+
+    get_session.__doc__ = f"Dependency for getting {name.lower()} database session"
+    return get_session
+
+
+get_async_todos_session = make_session_dependency(lambda: todos_db, "Todos")
+get_async_employees_session = make_session_dependency(
+    lambda: employees_db, "Employees"
+)
 
 
 # Global database managers - to be initialized with actual URLs
@@ -2,15 +2,39 @@
 Shared exception handlers and custom exceptions
 """
 
+from typing import Any
+
 from fastapi import HTTPException, status
 from fastapi.responses import JSONResponse
 from fastapi.requests import Request
 from pydantic import ValidationError
+import json
 import logging
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
+class ErrorJSONResponse(JSONResponse):
+    """JSON error response rendered with orjson, falling back to the stdlib encoder
+
+    Named apart from fastapi.responses.ORJSONResponse, which requires orjson.
+    """
+
+    def render(self, content: Any) -> bytes:
+        # default=str covers exception objects nested in Pydantic error contexts
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(content, default=str)
+        return json.dumps(
+            content, default=str, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
 class DatabaseError(Exception):
     """Custom database error"""
     pass
@@ -24,7 +48,7 @@ class BusinessLogicError(Exception):
 async def validation_exception_handler(request: Request, exc: ValidationError):
     """Handle Pydantic validation errors"""
     logger.error(f"Validation error: {exc}")
-    return JSONResponse(
+    return ErrorJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={
             "detail": "Validation error",
@@ -36,7 +60,7 @@ async def validation_exception_handler(request: Request, exc: ValidationError):
 async def database_exception_handler(request: Request, exc: DatabaseError):
     """Handle database errors"""
     logger.error(f"Database error: {exc}")
-    return JSONResponse(
+    return ErrorJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "Database error occurred"}
     )
@@ -45,7 +69,7 @@ async def database_exception_handler(request: Request, exc: DatabaseError):
 async def business_logic_exception_handler(request: Request, exc: BusinessLogicError):
     """Handle business logic errors"""
     logger.error(f"Business logic error: {exc}")
-    return JSONResponse(
+    return ErrorJSONResponse(
         status_code=status.HTTP_400_BAD_REQUEST,
         content={"detail": str(exc)}
     )
\ No newline at end of file
@@ -3,18 +3,27 @@ Advanced API Features for FastAPI TODO Application
 """
 
 from typing import Optional, List, Dict, Any, Union
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 import asyncio
 import json
+import time
 import uuid
+from functools import lru_cache
 from fastapi import HTTPException, Query, Depends, BackgroundTasks, Request
 from fastapi.responses import StreamingResponse, FileResponse
 from pydantic import BaseModel, Field, validator
-import pandas as pd
-from io import StringIO, BytesIO
-import csv
+
+from ..core.config import get_settings
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+_UTC = timezone.utc
 
 
 # Advanced Filtering and Sorting
@@ -23,13 +32,6 @@ class SortDirection(str, Enum):
     DESC = "desc"
 
 
-class TodoStatus(str, Enum):
-    PENDING = "pending"
-    IN_PROGRESS = "in_progress"
-    COMPLETED = "completed"
-    CANCELLED = "cancelled"
-
-
 class FilterOperator(str, Enum):
     EQUALS = "eq"
     NOT_EQUALS = "ne"
@@ -164,14 +166,48 @@ class SearchResponse(BaseModel):
     execution_time: float
 
 
+@dataclass(slots=True)
+class ExportJob:
+    """Export/import job state"""
+    status: str
+    created_at: datetime
+    format: Optional[ExportFormat] = None
+    file_path: Optional[str] = None
+    file_size: int = 0
+    record_count: int = 0
+    error: Optional[str] = None
+
+
+class JobStore:
+    """Job registry split across independently locked shards"""
+    
+    def __init__(self, shard_count: int = 16):
+        self._shards: List[tuple[Dict[str, ExportJob], asyncio.Lock]] = [
+            ({}, asyncio.Lock()) for _ in range(shard_count)
+        ]
+    
+    def _shard(self, job_id: str) -> tuple[Dict[str, ExportJob], asyncio.Lock]:
+        return self._shards[hash(job_id) % len(self._shards)]
+    
+    async def set(self, job_id: str, job: ExportJob) -> None:
+        jobs, lock = self._shard(job_id)
+        async with lock:
+            jobs[job_id] = job
+    
+    async def get(self, job_id: str) -> Optional[ExportJob]:
+        jobs, lock = self._shard(job_id)
+        async with lock:
+            return jobs.get(job_id)
+
+
 # Advanced API Service
 class AdvancedAPIService:
     """Service for advanced API features"""
     
     def __init__(self):
         self.search_indexes = {}
-        self.export_jobs = {}
-        self.import_jobs = {}
+        self.export_jobs = JobStore()
+        self.import_jobs = JobStore()
     
     async def execute_advanced_query(self, query_params: AdvancedQueryParams, data_source: str) -> Dict[str, Any]:
         """Execute advanced query with filtering, sorting, and pagination"""
@@ -181,13 +217,15 @@ class AdvancedAPIService:
         results = []  # Would contain actual filtered/sorted data
         total = 0     # Would contain total count before pagination
         
+        pagination = query_params.pagination
+        size = pagination.size
         response = {
             "data": results,
             "pagination": {
-                "page": query_params.pagination.page,
-                "size": query_params.pagination.size,
+                "page": pagination.page,
+                "size": size,
                 "total": total,
-                "pages": (total + query_params.pagination.size - 1) // query_params.pagination.size
+                "pages": -(-total // size) if size else 0
             }
         }
         
@@ -201,48 +239,64 @@ class AdvancedAPIService:
         
         return response
     
+    async def _execute_bulk_item(
+        self,
+        operation: BulkOperation,
+        item: Dict[str, Any],
+        semaphore: asyncio.Semaphore
+    ) -> Optional[Dict[str, Any]]:
+        """Execute a single bulk operation item"""
+        async with semaphore:
+            # Execute individual operation
+            # This would integrate with your actual business logic
+            
+            if operation == BulkOperation.CREATE:
+                # Mock create operation
+                return {"id": str(uuid.uuid4()), "created": True}
+            
+            elif operation == BulkOperation.UPDATE:
+                # Mock update operation
+                return {"id": item.get("id"), "updated": True}
+            
+            elif operation == BulkOperation.DELETE:
+                # Mock delete operation
+                return {"id": item.get("id"), "deleted": True}
+            
+            return None
+    
     async def execute_bulk_operation(self, bulk_request: BulkRequest) -> BulkResult:
-        """Execute bulk operations with error handling"""
-        start_time = asyncio.get_event_loop().time()
+        """Execute bulk operations concurrently with error handling"""
+        start_time = time.perf_counter()
         
         successful = 0
         failed = 0
         errors = []
         results = []
         
-        for idx, item in enumerate(bulk_request.data):
-            try:
-                # Execute individual operation
-                # This would integrate with your actual business logic
-                
-                if bulk_request.operation == BulkOperation.CREATE:
-                    # Mock create operation
-                    result = {"id": str(uuid.uuid4()), "created": True}
-                    results.append(result)
-                    successful += 1
-                
-                elif bulk_request.operation == BulkOperation.UPDATE:
-                    # Mock update operation
-                    result = {"id": item.get("id"), "updated": True}
-                    results.append(result)
-                    successful += 1
-                
-                elif bulk_request.operation == BulkOperation.DELETE:
-                    # Mock delete operation
-                    result = {"id": item.get("id"), "deleted": True}
-                    results.append(result)
-                    successful += 1
-                    
-            except Exception as e:
+        # Run items concurrently, capped at the configured request concurrency
+        semaphore = asyncio.Semaphore(get_settings().MAX_CONCURRENT_REQUESTS)
+        outcomes = await asyncio.gather(
+            *(
+                self._execute_bulk_item(bulk_request.operation, item, semaphore)
+                for item in bulk_request.data
+            ),
+            return_exceptions=True
+        )
+        
+        for idx, (item, outcome) in enumerate(zip(bulk_request.data, outcomes)):
+            if isinstance(outcome, Exception):
                 failed += 1
                 errors.append({
                     "index": idx,
                     "item": item,
-                    "error": str(e),
-                    "error_type": type(e).__name__
+                    "error": str(outcome),
+                    "error_type": type(outcome).__name__
                 })
+            elif outcome is not None:
+                results.append(outcome)
+                successful += 1
         
-        execution_time = asyncio.get_event_loop().time() - start_time
+        execution_time = time.perf_counter() - start_time
         
         return BulkResult(
             operation=bulk_request.operation,
@@ -271,32 +325,33 @@ class AdvancedAPIService:
             await asyncio.sleep(2)  # Simulate processing time
             
             # Update job status
-            self.export_jobs[job_id] = {
-                "status": "completed",
-                "format": export_request.format,
-                "created_at": datetime.now(),
-                "file_path": f"/exports/{job_id}.{export_request.format.value}",
-                "file_size": 1024,  # Mock size
-                "record_count": 100  # Mock count
-            }
+            await self.export_jobs.set(job_id, ExportJob(
+                status="completed",
+                format=export_request.format,
+                created_at=datetime.now(_UTC),
+                file_path=f"/exports/{job_id}.{export_request.format.value}",
+                file_size=1024,  # Mock size
+                record_count=100  # Mock count
+            ))
             
         except Exception as e:
-            self.export_jobs[job_id] = {
-                "status": "failed",
-                "error": str(e),
-                "created_at": datetime.now()
-            }
+            await self.export_jobs.set(job_id, ExportJob(
+                status="failed",
+                error=str(e),
+                created_at=datetime.now(_UTC)
+            ))
     
     async def get_export_status(self, job_id: str) -> Dict[str, Any]:
         """Get export job status"""
-        if job_id not in self.export_jobs:
+        job = await self.export_jobs.get(job_id)
+        if job is None:
             raise HTTPException(status_code=404, detail="Export job not found")
         
-        return self.export_jobs[job_id]
+        return asdict(job)
     
     async def advanced_search(self, search_request: SearchRequest, data_source: str) -> SearchResponse:
         """Perform advanced search with relevance scoring"""
-        start_time = asyncio.get_event_loop().time()
+        start_time = time.perf_counter()
         
         # Mock search results
         results = [
@@ -308,12 +363,12 @@ class AdvancedAPIService:
             )
         ]
         
-        execution_time = asyncio.get_event_loop().time() - start_time
+        execution_time = time.perf_counter() - start_time
         
         return SearchResponse(
             query=search_request.query,
             total_hits=len(results),
-            max_score=max([r.score for r in results]) if results else 0.0,
+            max_score=max((r.score for r in results), default=0.0),
             results=results,
             execution_time=execution_time
         )
@@ -324,7 +379,7 @@ class AdvancedAPIService:
         analytics = {
             "summary": {
                 "total_records": 1000,
-                "last_updated": datetime.now(),
+                "last_updated": datetime.now(_UTC),
                 "growth_rate": 5.2
             },
             "metrics": {
@@ -345,6 +400,18 @@ class AdvancedAPIService:
 advanced_api_service = AdvancedAPIService()
 
 
+@lru_cache(maxsize=512)
+def _parse_filters(raw: str) -> tuple[FilterCriteria, ...]:
+    """Parse a JSON filter query string once per distinct value"""
+    return tuple(FilterCriteria(**f) for f in _json_loads(raw))
+
+
+@lru_cache(maxsize=128)
+def _default_query_params(page: int, size: int) -> AdvancedQueryParams:
+    """Shared read-only query params for requests without filters or sorting"""
+    return AdvancedQueryParams(pagination=PaginationParams(page=page, size=size))
+
+
 # Dependency functions for FastAPI
 async def get_query_params(
     page: int = Query(1, ge=1),
@@ -355,6 +422,10 @@ async def get_query_params(
 ) -> AdvancedQueryParams:
     """Parse query parameters into AdvancedQueryParams"""
     
+    # Common case: plain pagination, reuse a cached instance
+    if not sort_by and not filters:
+        return _default_query_params(page, size)
+    
     # Parse pagination
     pagination = PaginationParams(page=page, size=size)
     
@@ -367,10 +438,8 @@ async def get_query_params(
     filter_list = []
     if filters:
         try:
-            filter_data = json.loads(filters)
-            for f in filter_data:
-                filter_list.append(FilterCriteria(**f))
-        except (json.JSONDecodeError, ValueError):
+            filter_list = list(_parse_filters(filters))
+        except (json.JSONDecodeError, TypeError, ValueError):
             pass
     
     return AdvancedQueryParams(
@@ -383,6 +452,8 @@ async def get_query_params(
 # Export main components
 __all__ = [
     'AdvancedAPIService',
+    'ExportJob',
+    'JobStore',
     'AdvancedQueryParams',
     'BulkRequest',
     'BulkResult',
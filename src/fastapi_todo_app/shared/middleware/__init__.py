@@ -10,21 +10,24 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Monotonic clock for elapsed-time measurement
+_perf_counter = time.perf_counter
+
 
 class LoggingMiddleware(BaseHTTPMiddleware):
     """Middleware for logging requests and responses"""
     
     async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+        start_time = _perf_counter()
         
         # Log request
-        logger.info(f"Request: {request.method} {request.url}")
+        logger.info("Request: %s %s", request.method, request.url)
         
         response = await call_next(request)
         
         # Log response
-        process_time = time.time() - start_time
-        logger.info(f"Response: {response.status_code} - {process_time:.4f}s")
+        process_time = _perf_counter() - start_time
+        logger.info("Response: %d - %.4fs", response.status_code, process_time)
         
         return response
 
@@ -33,8 +36,8 @@ class TimingMiddleware(BaseHTTPMiddleware):
     """Middleware for adding response time headers"""
     
     async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+        start_time = _perf_counter()
         response = await call_next(request)
-        process_time = time.time() - start_time
-        response.headers["X-Process-Time"] = str(process_time)
+        process_time = _perf_counter() - start_time
+        response.headers["X-Process-Time"] = f"{process_time:.6f}"
         return response
@@ -6,10 +6,12 @@ from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 import time
 import logging
-import asyncio
 from typing import Callable
 
-logger = logging.getLogger(__name__)
+from ..monitoring.observability import use_log_queue
+from ..utils.caching import request_cache_counters
+
+logger = use_log_queue(logging.getLogger(__name__))
 
 
 class PerformanceMiddleware(BaseHTTPMiddleware):
@@ -21,28 +23,28 @@ class PerformanceMiddleware(BaseHTTPMiddleware):
         
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         # Start timing
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         
         # Process request
         response = await call_next(request)
         
         # Calculate metrics
-        process_time = time.time() - start_time
+        process_time = (time.perf_counter_ns() - start_ns) / 1e9
         
         # Add performance headers
-        response.headers["X-Process-Time"] = f"{process_time:.4f}"
+        response.raw_headers.append((b"x-process-time", b"%.4f" % process_time))
         response.headers["X-Request-ID"] = getattr(request.state, "request_id", "unknown")
         
-        # Log slow requests
-        if process_time > self.slow_request_threshold:
-            logger.warning(
-                f"Slow request detected: {request.method} {request.url} - {process_time:.4f}s"
-            )
-        
-        # Log request completion
-        logger.info(
-            f"{request.method} {request.url} - {response.status_code} - {process_time:.4f}s"
-        )
+        # Log slow requests / request completion; %-style arguments are only
+        # formatted (in the log listener thread) when the level is enabled
+        is_slow = process_time > self.slow_request_threshold
+        log_info = logger.isEnabledFor(logging.INFO)
+        if is_slow or log_info:
+            url = str(request.url)
+            if is_slow:
+                logger.warning("Slow request detected: %s %s - %.4fs", request.method, url, process_time)
+            if log_info:
+                logger.info("%s %s - %d - %.4fs", request.method, url, response.status_code, process_time)
         
         return response
 
@@ -76,21 +78,24 @@ class CacheMetricsMiddleware(BaseHTTPMiddleware):
     """Middleware for tracking cache performance"""
     
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Initialize cache metrics
-        request.state.cache_hits = 0
-        request.state.cache_misses = 0
-        
-        response = await call_next(request)
+        # Initialize request-local cache counters; the list is shared by
+        # reference with the task running the endpoint
+        counters = [0, 0]
+        token = request_cache_counters.set(counters)
+        try:
+            response = await call_next(request)
+        finally:
+            request_cache_counters.reset(token)
         
         # Add cache metrics to response headers
-        cache_hit_ratio = (
-            request.state.cache_hits / 
-            (request.state.cache_hits + request.state.cache_misses)
-            if (request.state.cache_hits + request.state.cache_misses) > 0 else 0
-        )
+        cache_hits, cache_misses = counters
+        total = cache_hits + cache_misses
+        cache_hit_ratio = cache_hits / total if total else 0.0
         
-        response.headers["X-Cache-Hit-Ratio"] = f"{cache_hit_ratio:.2f}"
-        response.headers["X-Cache-Hits"] = str(request.state.cache_hits)
-        response.headers["X-Cache-Misses"] = str(request.state.cache_misses)
+        response.raw_headers.extend((
+            (b"x-cache-hit-ratio", b"%.2f" % cache_hit_ratio),
+            (b"x-cache-hits", b"%d" % cache_hits),
+            (b"x-cache-misses", b"%d" % cache_misses),
+        ))
         
         return response
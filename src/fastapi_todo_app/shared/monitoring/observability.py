@@ -3,17 +3,140 @@ Advanced Observability and Monitoring System
 """
 
 import json
+import queue
+import itertools
+import random
+import secrets
 import time
 import traceback
 import asyncio
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple, NamedTuple
 from datetime import datetime, timezone, timedelta
 from dataclasses import dataclass, asdict
 from collections import deque, defaultdict
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
+import numpy as np
 import psutil
 import logging
+from logging.handlers import QueueHandler, QueueListener
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _json_default(value: Any) -> Any:
+    """Fallback encoder for values the stdlib json module cannot handle"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps_json(data: Any) -> str:
+    """Serialize log/metric payloads with orjson when available"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(
+            data,
+            default=str,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+        ).decode()
+    return json.dumps(data, default=_json_default)
+
+
+class JSONLogFormatter(logging.Formatter):
+    """Encode each log record, including structured fields, as one JSON object"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {}
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        metric = getattr(record, "metric", None)
+        if metric is not None:
+            entry.update(metric._asdict())
+        # Record attributes are merged last so structured fields cannot overwrite them
+        entry.update(
+            timestamp=datetime.fromtimestamp(record.created, timezone.utc),
+            level=record.levelname,
+            logger=record.name,
+            message=record.getMessage(),
+            module=record.module,
+            function=record.funcName,
+            line=record.lineno,
+        )
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return dumps_json(entry)
+
+
+# Non-blocking log pipeline: request-path loggers only enqueue records and a
+# background listener thread performs formatting and stream writes.
+log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=10000)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue is in-process, so the record can be handed over as-is and
+        # message/metric formatting left entirely to the listener thread.
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        # Without a running listener (no app lifespan: scripts, ASGITransport
+        # tests) nothing drains the queue, so write the record directly
+        if not _log_listener_running:
+            _log_stream_handler.handle(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(JSONLogFormatter())
+log_listener = QueueListener(log_queue, _log_stream_handler, respect_handler_level=True)
+
+
+def use_log_queue(logger: logging.Logger) -> logging.Logger:
+    """Route a logger's records through the shared non-blocking log queue"""
+    if not any(isinstance(h, NonBlockingQueueHandler) for h in logger.handlers):
+        logger.addHandler(NonBlockingQueueHandler(log_queue))
+    logger.propagate = False
+    return logger
+
+
+_log_listener_running = False
+
+
+def start_log_listener():
+    """Start the background log writer thread (called from app lifespan)"""
+    global _log_listener_running
+    if not _log_listener_running:
+        log_listener.start()
+        _log_listener_running = True
+
+
+def stop_log_listener():
+    """Flush queued records and stop the background log writer thread"""
+    global _log_listener_running
+    if _log_listener_running:
+        # Clear the flag first so records logged during shutdown are written
+        # directly rather than queued behind the listener's stop sentinel
+        _log_listener_running = False
+        log_listener.stop()
+
+
+# Request IDs: a random per-process prefix plus a monotonically increasing counter
+_REQUEST_ID_PREFIX = secrets.token_hex(4)
+_req_counter = itertools.count().__next__
+
 
 # Configure structured logging
 class StructuredLogger:
@@ -23,32 +146,37 @@ class StructuredLogger:
         self.logger = logging.getLogger(name)
         self.logger.setLevel(logging.INFO)
         
-        # Create JSON formatter
-        formatter = logging.Formatter(
-            '{"timestamp": "%(asctime)s", "level": "%(levelname)s", "logger": "%(name)s", "message": "%(message)s", "module": "%(module)s", "function": "%(funcName)s", "line": "%(lineno)d"}'
-        )
-        
-        handler = logging.StreamHandler()
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
+        # Records are written as JSON by the queue listener thread
+        use_log_queue(self.logger)
     
+    # Structured fields are attached to the record and encoded by JSONLogFormatter
     def info(self, message: str, **kwargs):
-        extra_data = json.dumps(kwargs) if kwargs else ""
-        self.logger.info(f"{message} {extra_data}")
+        self.logger.info(message, extra={"fields": kwargs})
     
     def error(self, message: str, **kwargs):
-        extra_data = json.dumps(kwargs) if kwargs else ""
-        self.logger.error(f"{message} {extra_data}")
+        self.logger.error(message, extra={"fields": kwargs})
     
     def warning(self, message: str, **kwargs):
-        extra_data = json.dumps(kwargs) if kwargs else ""
-        self.logger.warning(f"{message} {extra_data}")
+        self.logger.warning(message, extra={"fields": kwargs})
+    
+    def metric(self, level: int, message: str, metric: Any):
+        """Enqueue a metric object; it is serialized by the listener thread"""
+        self.logger.log(level, message, extra={"metric": metric})
 
 
-@dataclass
-class RequestMetric:
-    """Data class for request metrics"""
-    timestamp: datetime
+# Offset between the monotonic perf counter and wall-clock time, sampled once
+# so per-request timestamps can be taken as a single perf_counter_ns() read.
+_WALL_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+
+
+def monotonic_to_datetime(ns: int) -> datetime:
+    """Convert a perf_counter_ns() reading into an aware UTC datetime"""
+    return datetime.fromtimestamp((ns + _WALL_OFFSET_NS) / 1e9, timezone.utc)
+
+
+class RequestMetric(NamedTuple):
+    """Request metric as a tuple of primitives"""
+    start_ns: int
     method: str
     path: str
     status_code: int
@@ -56,6 +184,40 @@ class RequestMetric:
     user_agent: Optional[str] = None
     ip_address: Optional[str] = None
     user_id: Optional[str] = None
+    
+    @property
+    def timestamp(self) -> datetime:
+        return monotonic_to_datetime(self.start_ns)
+
+
+class RequestMetricBuffer:
+    """Fixed-size ring buffer keeping request metrics as parallel NumPy columns"""
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._start_ns = np.zeros(capacity, dtype=np.int64)
+        self._response_time = np.zeros(capacity, dtype=np.float32)
+        self._status = np.zeros(capacity, dtype=np.uint16)
+        self._written = 0
+    
+    def __len__(self) -> int:
+        return min(self._written, self.capacity)
+    
+    def append(self, metric: RequestMetric):
+        i = self._written % self.capacity
+        self._start_ns[i] = metric.start_ns
+        self._response_time[i] = metric.response_time
+        self._status[i] = metric.status_code
+        self._written += 1
+    
+    def clear(self):
+        self._written = 0
+    
+    def since(self, cutoff_ns: int):
+        """Response times and status codes of metrics started after cutoff_ns"""
+        n = len(self)
+        mask = self._start_ns[:n] > cutoff_ns
+        return self._response_time[:n][mask], self._status[:n][mask]
 
 
 @dataclass
@@ -69,47 +231,91 @@ class SystemMetric:
     active_connections: int
 
 
+@dataclass(slots=True)
+class EndpointStats:
+    """Running per-endpoint request statistics"""
+    count: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    min_time: float = float('inf')
+    error_count: int = 0
+    last_accessed: Optional[int] = None  # perf_counter_ns() of the latest request
+
+
+@dataclass(frozen=True, slots=True)
+class MetricsSnapshot:
+    """Derived request/system figures shared by alert checks within one tick"""
+    avg_response_time: float
+    error_rate: float
+    health_alerts: Tuple[str, ...]
+
+
 class MetricsCollector:
     """Advanced metrics collection and analysis"""
     
     def __init__(self, max_metrics: int = 10000):
-        self.request_metrics: deque = deque(maxlen=max_metrics)
+        self.request_metrics = RequestMetricBuffer(max_metrics)
         self.system_metrics: deque = deque(maxlen=1000)
         self.error_metrics: deque = deque(maxlen=1000)
-        self.endpoint_stats: Dict[str, Dict] = defaultdict(lambda: {
-            'count': 0,
-            'total_time': 0,
-            'avg_time': 0,
-            'max_time': 0,
-            'min_time': float('inf'),
-            'error_count': 0,
-            'last_accessed': None
-        })
-        
-        # Start system metrics collection
-        asyncio.create_task(self._collect_system_metrics())
+        self.endpoint_stats: Dict[str, EndpointStats] = {}
+        
+        # Cached active-connection count: (value, monotonic time sampled)
+        self._connections_cache: tuple = (0, float('-inf'))
+        self._connections_ttl = 60.0
+        
+        # minutes -> (monotonic time taken, snapshot)
+        self._snapshot_cache: Dict[int, Tuple[float, MetricsSnapshot]] = {}
+        
+        # System metrics collection task; started from the app lifespan
+        self._collector_task: Optional[asyncio.Task] = None
+    
+    async def start(self):
+        """Start periodic system metrics collection on the running loop"""
+        if self._collector_task is None or self._collector_task.done():
+            self._collector_task = asyncio.create_task(self._collect_system_metrics())
+    
+    async def stop(self):
+        """Cancel system metrics collection and wait for it to finish"""
+        task, self._collector_task = self._collector_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    
+    def _count_connections(self) -> int:
+        """Active TCP connections, re-enumerated at most once per TTL"""
+        count, sampled_at = self._connections_cache
+        now = time.monotonic()
+        if now - sampled_at >= self._connections_ttl:
+            count = len(psutil.net_connections(kind='tcp'))
+            self._connections_cache = (count, now)
+        return count
+    
+    def _sample_system(self) -> SystemMetric:
+        """Take one system snapshot (blocking psutil calls, run off the loop)"""
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        
+        return SystemMetric(
+            timestamp=datetime.now(timezone.utc),
+            # Non-blocking: CPU usage since the previous call
+            cpu_percent=psutil.cpu_percent(interval=None),
+            memory_percent=memory.percent,
+            memory_used_mb=memory.used / (1024 * 1024),
+            disk_percent=disk.percent,
+            active_connections=self._count_connections()
+        )
     
     async def _collect_system_metrics(self):
         """Collect system metrics periodically"""
+        # Prime the CPU counter so the first interval=None reading is meaningful
+        psutil.cpu_percent(interval=None)
+        
         while True:
             try:
-                # Get system information
-                cpu_percent = psutil.cpu_percent(interval=1)
-                memory = psutil.virtual_memory()
-                disk = psutil.disk_usage('/')
-                
-                # Get active connections (approximation)
-                connections = len(psutil.net_connections())
-                
-                metric = SystemMetric(
-                    timestamp=datetime.now(timezone.utc),
-                    cpu_percent=cpu_percent,
-                    memory_percent=memory.percent,
-                    memory_used_mb=memory.used / (1024 * 1024),
-                    disk_percent=disk.percent,
-                    active_connections=connections
-                )
-                
+                metric = await asyncio.to_thread(self._sample_system)
                 self.system_metrics.append(metric)
                 
                 await asyncio.sleep(30)  # Collect every 30 seconds
@@ -124,17 +330,21 @@ class MetricsCollector:
         
         # Update endpoint statistics
         endpoint_key = f"{metric.method}:{metric.path}"
-        stats = self.endpoint_stats[endpoint_key]
-        
-        stats['count'] += 1
-        stats['total_time'] += metric.response_time
-        stats['avg_time'] = stats['total_time'] / stats['count']
-        stats['max_time'] = max(stats['max_time'], metric.response_time)
-        stats['min_time'] = min(stats['min_time'], metric.response_time)
-        stats['last_accessed'] = metric.timestamp
+        stats = self.endpoint_stats.get(endpoint_key)
+        if stats is None:
+            stats = self.endpoint_stats[endpoint_key] = EndpointStats()
+        
+        response_time = metric.response_time
+        stats.count += 1
+        stats.total_time += response_time
+        if response_time > stats.max_time:
+            stats.max_time = response_time
+        if response_time < stats.min_time:
+            stats.min_time = response_time
+        stats.last_accessed = metric.start_ns
         
         if metric.status_code >= 400:
-            stats['error_count'] += 1
+            stats.error_count += 1
     
     def record_error(self, error_info: Dict[str, Any]):
         """Record error information"""
@@ -143,10 +353,11 @@ class MetricsCollector:
     
     def get_request_stats(self, minutes: int = 60) -> Dict[str, Any]:
         """Get request statistics for the last N minutes"""
-        cutoff_time = datetime.now(timezone.utc) - timedelta(minutes=minutes)
-        recent_metrics = [m for m in self.request_metrics if m.timestamp > cutoff_time]
+        cutoff_ns = time.perf_counter_ns() - minutes * 60_000_000_000
+        response_times, status_codes = self.request_metrics.since(cutoff_ns)
+        total_requests = int(response_times.size)
         
-        if not recent_metrics:
+        if not total_requests:
             return {
                 'total_requests': 0,
                 'avg_response_time': 0,
@@ -154,9 +365,8 @@ class MetricsCollector:
                 'requests_per_minute': 0
             }
         
-        total_requests = len(recent_metrics)
-        avg_response_time = sum(m.response_time for m in recent_metrics) / total_requests
-        error_count = sum(1 for m in recent_metrics if m.status_code >= 400)
+        avg_response_time = float(response_times.mean(dtype=np.float64))
+        error_count = int(np.count_nonzero(status_codes >= 400))
         error_rate = (error_count / total_requests) * 100
         requests_per_minute = total_requests / minutes
         
@@ -165,15 +375,13 @@ class MetricsCollector:
             'avg_response_time': round(avg_response_time, 4),
             'error_rate': round(error_rate, 2),
             'requests_per_minute': round(requests_per_minute, 2),
-            'status_codes': self._get_status_code_distribution(recent_metrics)
+            'status_codes': self._get_status_code_distribution(status_codes)
         }
     
-    def _get_status_code_distribution(self, metrics: List[RequestMetric]) -> Dict[int, int]:
+    def _get_status_code_distribution(self, status_codes: np.ndarray) -> Dict[int, int]:
         """Get distribution of status codes"""
-        distribution = defaultdict(int)
-        for metric in metrics:
-            distribution[metric.status_code] += 1
-        return dict(distribution)
+        codes, counts = np.unique(status_codes, return_counts=True)
+        return dict(zip(codes.tolist(), counts.tolist()))
     
     def get_system_health(self) -> Dict[str, Any]:
         """Get current system health"""
@@ -205,20 +413,41 @@ class MetricsCollector:
             'uptime_seconds': time.time() - psutil.boot_time()
         }
     
+    def snapshot(self, minutes: int = 5, max_age: float = 1.0) -> MetricsSnapshot:
+        """Compute request stats and health once, reusing them for max_age seconds"""
+        now = time.monotonic()
+        cached = self._snapshot_cache.get(minutes)
+        if cached is not None and now - cached[0] < max_age:
+            return cached[1]
+        
+        stats = self.get_request_stats(minutes=minutes)
+        health = self.get_system_health()
+        snap = MetricsSnapshot(
+            avg_response_time=stats['avg_response_time'],
+            error_rate=stats['error_rate'],
+            health_alerts=tuple(health.get('alerts', ()))
+        )
+        self._snapshot_cache[minutes] = (now, snap)
+        return snap
+    
     def get_top_endpoints(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get top endpoints by various metrics"""
-        endpoints = []
-        
-        for endpoint, stats in self.endpoint_stats.items():
-            endpoints.append({
-                'endpoint': endpoint,
-                **stats
-            })
-        
         # Sort by request count
-        endpoints.sort(key=lambda x: x['count'], reverse=True)
+        top = sorted(self.endpoint_stats.items(), key=lambda item: item[1].count, reverse=True)
         
-        return endpoints[:limit]
+        return [
+            {
+                'endpoint': endpoint,
+                'count': stats.count,
+                'total_time': stats.total_time,
+                'avg_time': stats.total_time / stats.count,
+                'max_time': stats.max_time,
+                'min_time': stats.min_time,
+                'error_count': stats.error_count,
+                'last_accessed': monotonic_to_datetime(stats.last_accessed) if stats.last_accessed else None
+            }
+            for endpoint, stats in top[:limit]
+        ]
     
     def get_error_summary(self, hours: int = 24) -> Dict[str, Any]:
         """Get error summary for the last N hours"""
@@ -236,6 +465,40 @@ class MetricsCollector:
         }
 
 
+class LogSampler:
+    """Sample routine request logs and fold duplicates into periodic counts"""
+    
+    def __init__(self, sample_rate: float = 0.1, window_seconds: float = 5.0, max_keys: int = 10000):
+        self.sample_rate = sample_rate
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._seen: set = set()
+        self._suppressed: Dict[tuple, int] = {}
+        self._next_flush = time.monotonic() + window_seconds
+    
+    def admit(self, key: tuple) -> bool:
+        """First occurrence of a key per window is logged, repeats are sampled"""
+        if key not in self._seen:
+            if len(self._seen) < self.max_keys:
+                self._seen.add(key)
+            return True
+        if random.random() < self.sample_rate:
+            return True
+        if key in self._suppressed or len(self._suppressed) < self.max_keys:
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+        return False
+    
+    def flush_due(self) -> Optional[Dict[tuple, int]]:
+        """Return and reset suppressed counts once the window has elapsed"""
+        now = time.monotonic()
+        if now < self._next_flush:
+            return None
+        self._next_flush = now + self.window_seconds
+        self._seen.clear()
+        suppressed, self._suppressed = self._suppressed, {}
+        return suppressed or None
+
+
 class ObservabilityMiddleware(BaseHTTPMiddleware):
     """Comprehensive observability middleware"""
     
@@ -243,9 +506,10 @@ class ObservabilityMiddleware(BaseHTTPMiddleware):
         super().__init__(app)
         self.metrics_collector = metrics_collector
         self.logger = StructuredLogger(__name__)
+        self.log_sampler = LogSampler()
     
     async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         
         # Extract request information
         method = request.method
@@ -279,11 +543,11 @@ class ObservabilityMiddleware(BaseHTTPMiddleware):
             raise
         
         # Calculate response time
-        response_time = time.time() - start_time
+        response_time = (time.perf_counter_ns() - start_ns) / 1e9
         
         # Record request metric
         metric = RequestMetric(
-            timestamp=datetime.now(timezone.utc),
+            start_ns=start_ns,
             method=method,
             path=path,
             status_code=status_code,
@@ -294,26 +558,25 @@ class ObservabilityMiddleware(BaseHTTPMiddleware):
         
         self.metrics_collector.record_request(metric)
         
-        # Log request
-        log_data = {
-            'method': method,
-            'path': path,
-            'status_code': status_code,
-            'response_time': round(response_time, 4),
-            'ip_address': ip_address,
-            'user_agent': user_agent
-        }
-        
+        # Log request; the metric is encoded off the request path. Errors and
+        # slow requests are always logged, routine ones are sampled/deduplicated
         if status_code >= 400:
-            self.logger.error("Request error", **log_data)
+            self.logger.metric(logging.ERROR, "Request error", metric)
         elif response_time > 1.0:  # Slow request threshold
-            self.logger.warning("Slow request", **log_data)
-        else:
-            self.logger.info("Request processed", **log_data)
+            self.logger.metric(logging.WARNING, "Slow request", metric)
+        elif self.logger.logger.isEnabledFor(logging.INFO):
+            if self.log_sampler.admit((method, path, status_code // 100)):
+                self.logger.metric(logging.INFO, "Request processed", metric)
+            suppressed = self.log_sampler.flush_due()
+            if suppressed:
+                self.logger.info(
+                    "Suppressed request logs",
+                    counts={f"{m} {p} {c}xx": n for (m, p, c), n in suppressed.items()}
+                )
         
         # Add performance headers
         response.headers["X-Response-Time"] = str(response_time)
-        response.headers["X-Request-ID"] = f"{int(time.time())}-{hash(request.url.path)}"
+        response.headers["X-Request-ID"] = f"{_REQUEST_ID_PREFIX}-{_req_counter():x}"
         
         return response
 
@@ -330,28 +593,31 @@ class AlertManager:
         }
         self.active_alerts = set()
     
-    async def check_alerts(self, metrics_collector: MetricsCollector):
-        """Check all alert conditions"""
+    async def check_alerts(self, metrics_collector: MetricsCollector, snapshot: Optional[MetricsSnapshot] = None):
+        """Check all alert conditions against one metrics snapshot"""
         alerts_triggered = []
         
+        if snapshot is None:
+            snapshot = metrics_collector.snapshot(
+                minutes=self.alert_rules['high_error_rate']['window_minutes']
+            )
+        
         # Check error rate
-        stats = metrics_collector.get_request_stats(minutes=5)
-        if stats['error_rate'] > self.alert_rules['high_error_rate']['threshold']:
-            alert = f"High error rate: {stats['error_rate']}%"
+        if snapshot.error_rate > self.alert_rules['high_error_rate']['threshold']:
+            alert = f"High error rate: {snapshot.error_rate}%"
             if alert not in self.active_alerts:
                 alerts_triggered.append(alert)
                 self.active_alerts.add(alert)
         
         # Check response time
-        if stats['avg_response_time'] > self.alert_rules['slow_response_time']['threshold']:
-            alert = f"Slow response time: {stats['avg_response_time']}s"
+        if snapshot.avg_response_time > self.alert_rules['slow_response_time']['threshold']:
+            alert = f"Slow response time: {snapshot.avg_response_time}s"
             if alert not in self.active_alerts:
                 alerts_triggered.append(alert)
                 self.active_alerts.add(alert)
         
         # Check system health
-        health = metrics_collector.get_system_health()
-        for alert_msg in health.get('alerts', []):
+        for alert_msg in snapshot.health_alerts:
             if alert_msg not in self.active_alerts:
                 alerts_triggered.append(alert_msg)
                 self.active_alerts.add(alert_msg)
@@ -366,10 +632,22 @@ alert_manager = AlertManager()
 # Export main components
 __all__ = [
     'MetricsCollector',
+    'NonBlockingQueueHandler',
+    'log_queue',
+    'log_listener',
+    'use_log_queue',
+    'start_log_listener',
+    'stop_log_listener',
     'ObservabilityMiddleware',
+    'LogSampler',
     'AlertManager',
     'StructuredLogger',
+    'JSONLogFormatter',
     'RequestMetric',
+    'RequestMetricBuffer',
+    'EndpointStats',
+    'MetricsSnapshot',
+    'monotonic_to_datetime',
     'SystemMetric',
     'metrics_collector',
     'alert_manager'
@@ -8,13 +8,19 @@ from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from passlib.context import CryptContext
 import jwt
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 import secrets
 import hashlib
-from functools import wraps
+import re
+from functools import lru_cache, wraps
+from collections import defaultdict, deque
+import asyncio
+import logging
 import time
 from starlette.middleware.base import BaseHTTPMiddleware
 
+logger = logging.getLogger(__name__)
+
 # JWT Configuration
 SECRET_KEY = secrets.token_urlsafe(32)
 ALGORITHM = "HS256"
@@ -23,6 +29,7 @@ REFRESH_TOKEN_EXPIRE_DAYS = 7
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_MAX_PASSWORD_BYTES = 72
 security = HTTPBearer()
 
 
@@ -31,6 +38,14 @@ class UserCreate(BaseModel):
     email: str
     password: str
     full_name: Optional[str] = None
+    
+    @field_validator("password")
+    @classmethod
+    def password_within_bcrypt_limit(cls, v: str) -> str:
+        # bcrypt would silently ignore everything past this length
+        if len(v.encode()) > BCRYPT_MAX_PASSWORD_BYTES:
+            raise ValueError(f"Password must be at most {BCRYPT_MAX_PASSWORD_BYTES} bytes")
+        return v
 
 
 class UserLogin(BaseModel):
@@ -55,18 +70,34 @@ class APIKey(BaseModel):
 class SecurityManager:
     """Advanced security management system"""
     
-    def __init__(self):
-        self.failed_attempts: Dict[str, list] = {}
+    def __init__(self, max_tracked_attempts: int = 200):
+        # Per-identifier attempt timestamps, oldest first; bounded so a single
+        # noisy client cannot grow its history without limit. The bound must be
+        # at least the largest max_attempts passed to check_rate_limit.
+        self.failed_attempts: Dict[str, deque] = defaultdict(
+            lambda: deque(maxlen=max_tracked_attempts)
+        )
         self.api_keys: Dict[str, APIKey] = {}
-        self.jwt_blacklist: set = set()
+        # Revoked tokens, keyed by their 16-byte jti (or a 128-bit digest of
+        # the raw token for tokens issued without one)
+        self.jwt_blacklist: set[bytes] = set()
+        # Bumped on every revocation so cached token decodes are invalidated
+        self.blacklist_generation = 0
         
-    def hash_password(self, password: str) -> str:
+    # bcrypt is deliberately slow and CPU-bound, so it runs in a worker thread
+    async def hash_password(self, password: str) -> str:
         """Hash password using bcrypt"""
-        return pwd_context.hash(password)
+        if len(password.encode()) > BCRYPT_MAX_PASSWORD_BYTES:
+            raise ValueError(f"Password must be at most {BCRYPT_MAX_PASSWORD_BYTES} bytes")
+        return await asyncio.to_thread(pwd_context.hash, password)
     
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify password against hash"""
-        return pwd_context.verify(plain_password, hashed_password)
+        # hash_password and UserCreate refuse passwords over the bcrypt limit,
+        # so longer input cannot match a stored hash; skip the bcrypt work
+        if len(plain_password.encode()) > BCRYPT_MAX_PASSWORD_BYTES:
+            return False
+        return await asyncio.to_thread(pwd_context.verify, plain_password, hashed_password)
     
     def create_access_token(self, data: dict, expires_delta: Optional[timedelta] = None):
         """Create JWT access token"""
@@ -79,6 +110,7 @@ class SecurityManager:
         to_encode.update({
             "exp": expire,
             "iat": datetime.utcnow(),
+            "jti": secrets.token_hex(16),
             "type": "access"
         })
         
@@ -93,6 +125,7 @@ class SecurityManager:
         to_encode.update({
             "exp": expire,
             "iat": datetime.utcnow(),
+            "jti": secrets.token_hex(16),
             "type": "refresh"
         })
         
@@ -102,13 +135,14 @@ class SecurityManager:
     def verify_token(self, token: str) -> Dict[str, Any]:
         """Verify and decode JWT token"""
         try:
-            if token in self.jwt_blacklist:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            
+            if self.jwt_blacklist and self._blacklist_key(token, payload) in self.jwt_blacklist:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Token has been revoked"
                 )
             
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             return payload
         except jwt.ExpiredSignatureError:
             raise HTTPException(
@@ -159,50 +193,74 @@ class SecurityManager:
     
     def check_rate_limit(self, identifier: str, max_attempts: int = 5, window_minutes: int = 15) -> bool:
         """Check if user/IP has exceeded rate limits"""
-        now = time.time()
-        window_start = now - (window_minutes * 60)
-        
-        if identifier not in self.failed_attempts:
-            self.failed_attempts[identifier] = []
+        window_start = time.time() - (window_minutes * 60)
+        attempts = self.failed_attempts[identifier]
         
-        # Clean old attempts
-        self.failed_attempts[identifier] = [
-            attempt for attempt in self.failed_attempts[identifier]
-            if attempt > window_start
-        ]
+        # Clean old attempts (only the expired prefix is touched)
+        while attempts and attempts[0] <= window_start:
+            attempts.popleft()
         
-        return len(self.failed_attempts[identifier]) < max_attempts
+        return len(attempts) < max_attempts
     
     def record_failed_attempt(self, identifier: str):
         """Record failed login attempt"""
-        if identifier not in self.failed_attempts:
-            self.failed_attempts[identifier] = []
-        
         self.failed_attempts[identifier].append(time.time())
     
+    @staticmethod
+    def _blacklist_key(token: str, payload: Dict[str, Any]) -> bytes:
+        """Fixed-size blacklist key: the token's jti, or a BLAKE2b digest of it"""
+        jti = payload.get("jti")
+        if jti:
+            try:
+                return bytes.fromhex(jti)
+            except (TypeError, ValueError):
+                pass
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+    
     def blacklist_token(self, token: str):
         """Add token to blacklist (for logout)"""
-        self.jwt_blacklist.add(token)
+        try:
+            payload = jwt.decode(
+                token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False}
+            )
+        except jwt.JWTError:
+            payload = {}
+        self.jwt_blacklist.add(self._blacklist_key(token, payload))
+        self.blacklist_generation += 1
 
 
 # Global security manager instance
 security_manager = SecurityManager()
 
 
+@lru_cache(maxsize=4096)
+def _decode_user(token: str, generation: int) -> tuple[Optional[str], tuple[str, ...], Optional[float]]:
+    """Verify a token once per blacklist generation: (username, permissions, exp)"""
+    payload = security_manager.verify_token(token)
+    return payload.get("sub"), tuple(payload.get("permissions", [])), payload.get("exp")
+
+
 # Dependency functions
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current authenticated user from JWT token"""
-    token = credentials.credentials
-    payload = security_manager.verify_token(token)
+    username, permissions, expires_at = _decode_user(
+        credentials.credentials, security_manager.blacklist_generation
+    )
+    
+    # Cached decodes skip signature verification, so expiry is re-checked here
+    if expires_at is not None and expires_at <= time.time():
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has expired"
+        )
     
-    username = payload.get("sub")
     if username is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
     
-    return {"username": username, "permissions": payload.get("permissions", [])}
+    return {"username": username, "permissions": list(permissions)}
 
 
 async def get_api_key_user(request: Request):
@@ -247,38 +305,67 @@ def require_permissions(required_permissions: list[str]):
     return decorator
 
 
+# Static security headers, encoded once and appended to every response as-is
+_SECURITY_HEADERS = (
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+    (b"content-security-policy", b"default-src 'self'"),
+)
+
+
 class SecurityMiddleware(BaseHTTPMiddleware):
     """Security middleware for request validation"""
     
+    suspicious_patterns = (
+        r'<script',
+        r'javascript:',
+        r'SELECT.*FROM',
+        r'UNION.*SELECT',
+        r'DROP.*TABLE',
+    )
+    # All patterns are ASCII, so a single bytes alternation scans raw payloads
+    # in one pass without decoding them first.
+    _suspicious_re = re.compile("|".join(suspicious_patterns).encode(), re.IGNORECASE)
+    
     def __init__(self, app):
         super().__init__(app)
-        self.suspicious_patterns = [
-            r'<script',
-            r'javascript:',
-            r'SELECT.*FROM',
-            r'UNION.*SELECT',
-            r'DROP.*TABLE',
-        ]
+        # Matches are only observed: these patterns also hit ordinary input
+        # (searches like "drop off the table", Referer and Cookie values)
+        self.suspicious_requests = 0
+    
+    def is_suspicious(self, payload: bytes) -> bool:
+        """Check raw request bytes against the suspicious pattern set"""
+        return self._suspicious_re.search(payload) is not None
+    
+    def has_suspicious_headers(self, request: Request) -> bool:
+        """Scan raw header values and the query string in a single regex pass"""
+        scope = request.scope
+        # Newline separators keep '.*' patterns from matching across fields
+        payload = b"\n".join(value for _, value in scope["headers"])
+        query = scope.get("query_string")
+        if query:
+            payload += b"\n" + query
+        return self.is_suspicious(payload)
     
     async def dispatch(self, request: Request, call_next):
-        """Process security checks on requests"""
+        """Process security checks on requests
         
-        # Rate limiting check
-        client_ip = request.client.host if request.client else "unknown"
-        if not security_manager.check_rate_limit(client_ip, max_attempts=100, window_minutes=1):
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Rate limit exceeded"
+        Request rate limiting is left to the app's rate_limiting_middleware,
+        which returns proper 429 responses and exempts health/docs paths.
+        """
+        if self.has_suspicious_headers(request):
+            self.suspicious_requests += 1
+            logger.warning(
+                "Suspicious pattern in headers or query string: %s %s",
+                request.method, request.url.path
             )
         
         # Continue to next middleware/app and add security headers
         response = await call_next(request)
         
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY" 
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        response.headers["Content-Security-Policy"] = "default-src 'self'"
+        response.raw_headers.extend(_SECURITY_HEADERS)
         
         return response
 
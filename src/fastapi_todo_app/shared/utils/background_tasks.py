@@ -3,13 +3,24 @@ Background task processing and queue management
 """
 
 import asyncio
+import functools
+import heapq
+import itertools
 import logging
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable, Any, Optional, Dict, List
 from datetime import datetime, timezone
 from enum import Enum
-import uuid
 import json
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
@@ -48,21 +59,55 @@ class BackgroundTask:
     completed_at: Optional[datetime] = None
     error_message: Optional[str] = None
     result: Any = None
+    # Whether result can be returned as-is in a JSON response; set on completion
+    result_is_json: bool = False
+    created_at_iso: str = field(default="", repr=False)
+    # Internal key into TaskManager.tasks / running_tasks; id is the public handle
+    key: int = field(default=0, repr=False)
 
     def __post_init__(self):
         if self.created_at is None:
             self.created_at = datetime.now(timezone.utc)
+        self.created_at_iso = self.created_at.isoformat()
+
+
+def _is_json_serializable(value: Any) -> bool:
+    """Probe serializability once, when a task result is produced"""
+    try:
+        if ORJSON_AVAILABLE:
+            orjson.dumps(value)
+        else:
+            json.dumps(value)
+        return True
+    except (TypeError, ValueError):
+        return False
 
 
 class BackgroundTaskManager:
     """Enhanced background task manager"""
     
     def __init__(self):
-        self.tasks: Dict[str, BackgroundTask] = {}
-        self.task_queue = asyncio.Queue()
-        self.running_tasks: Dict[str, asyncio.Task] = {}
+        # Keyed by an internal counter; _keys maps the public task ID to it
+        self.tasks: Dict[int, BackgroundTask] = {}
+        self._keys: Dict[str, int] = {}
+        # Pending tasks as a heap of (not_before_ns, -priority, seq, task). New
+        # tasks use not_before_ns=0; retries carry their backoff deadline. seq
+        # keeps FIFO order within a priority and means BackgroundTask itself
+        # is never compared
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._key_counter = itertools.count()
+        # Created in start() so it binds to the loop the workers run on
+        self._cv: Optional[asyncio.Condition] = None
+        self.running_tasks: Dict[int, asyncio.Task] = {}
         self.workers: List[asyncio.Task] = []
+        self._supervisor: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Bounded pool for sync task functions, created in start()
+        self._executor: Optional[ThreadPoolExecutor] = None
         self.max_workers = 3
+        # Per-worker cap on attempts in flight, and so on tasks taken per dequeue
+        self.batch_size = 16
         self.is_running = False
     
     async def start(self):
@@ -71,34 +116,53 @@ class BackgroundTaskManager:
             return
         
         self.is_running = True
+        self._loop = asyncio.get_running_loop()
+        self._cv = asyncio.Condition()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="bgtask"
+        )
         logger.info(f"Starting {self.max_workers} background task workers")
         
-        for i in range(self.max_workers):
-            worker = asyncio.create_task(self._worker(f"worker-{i}"))
-            self.workers.append(worker)
+        self._supervisor = asyncio.create_task(self._run_workers())
+    
+    async def _run_workers(self):
+        """Own the worker tasks; cancelling this task cancels every worker"""
+        async with asyncio.TaskGroup() as tg:
+            for i in range(self.max_workers):
+                self.workers.append(tg.create_task(self._worker(f"worker-{i}")))
     
     async def stop(self):
         """Stop the task manager"""
         if not self.is_running:
             return
         
-        self.is_running = False
+        # Wake idle workers so they observe is_running=False
+        async with self._cv:
+            self.is_running = False
+            self._cv.notify_all()
         logger.info("Stopping background task manager")
         
-        # Cancel all workers
-        for worker in self.workers:
-            worker.cancel()
-        
-        # Wait for workers to finish
-        await asyncio.gather(*self.workers, return_exceptions=True)
+        # Cancel all workers via their task group and wait for them to finish
+        supervisor, self._supervisor = self._supervisor, None
+        if supervisor is not None:
+            supervisor.cancel()
+            try:
+                await supervisor
+            except asyncio.CancelledError:
+                pass
         self.workers.clear()
         
         # Cancel running tasks
-        for task_id, task in self.running_tasks.items():
+        for key, task in self.running_tasks.items():
             task.cancel()
-            logger.info(f"Cancelled running task: {task_id}")
+            logger.info(f"Cancelled running task: {self.tasks[key].id}")
         
         self.running_tasks.clear()
+        
+        # Release executor threads without waiting on in-flight sync calls
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
     
     async def add_task(
         self,
@@ -110,10 +174,14 @@ class BackgroundTaskManager:
         **kwargs
     ) -> str:
         """Add a new background task"""
-        task_id = str(uuid.uuid4())
+        # Task status and cancellation are reachable by ID over HTTP, so the
+        # public ID must not be guessable
+        task_id = secrets.token_hex(16)
+        key = next(self._key_counter)
         
         task = BackgroundTask(
             id=task_id,
+            key=key,
             name=name,
             function=function,
             args=args,
@@ -122,15 +190,26 @@ class BackgroundTaskManager:
             max_retries=max_retries
         )
         
-        self.tasks[task_id] = task
-        await self.task_queue.put(task)
+        self.tasks[key] = task
+        self._keys[task_id] = key
+        await self._push(task)
         
         logger.info(f"Added background task: {name} (ID: {task_id})")
         return task_id
     
+    async def _push(self, task: BackgroundTask, not_before_ns: int = 0):
+        """Queue a task, optionally not to run before a monotonic deadline"""
+        entry = (not_before_ns, -task.priority.value, next(self._seq), task)
+        if self._cv is None:
+            heapq.heappush(self._heap, entry)
+        else:
+            async with self._cv:
+                heapq.heappush(self._heap, entry)
+                self._cv.notify()
+    
     async def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
         """Get task status and details"""
-        task = self.tasks.get(task_id)
+        task = self._lookup(task_id)
         if not task:
             return None
         
@@ -141,7 +220,7 @@ class BackgroundTaskManager:
             "priority": task.priority.value,
             "retry_count": task.retry_count,
             "max_retries": task.max_retries,
-            "created_at": task.created_at.isoformat(),
+            "created_at": task.created_at_iso,
             "started_at": task.started_at.isoformat() if task.started_at else None,
             "completed_at": task.completed_at.isoformat() if task.completed_at else None,
             "error_message": task.error_message,
@@ -149,25 +228,20 @@ class BackgroundTaskManager:
         
         # Include result if completed successfully
         if task.status == TaskStatus.COMPLETED and task.result is not None:
-            try:
-                # Try to serialize result
-                json.dumps(task.result)
-                result["result"] = task.result
-            except (TypeError, ValueError):
-                result["result"] = str(task.result)
+            result["result"] = task.result if task.result_is_json else str(task.result)
         
         return result
     
     async def cancel_task(self, task_id: str) -> bool:
         """Cancel a pending or running task"""
-        task = self.tasks.get(task_id)
+        task = self._lookup(task_id)
         if not task:
             return False
         
         # If task is running, cancel the asyncio task
-        if task_id in self.running_tasks:
-            self.running_tasks[task_id].cancel()
-            del self.running_tasks[task_id]
+        running = self.running_tasks.pop(task.key, None)
+        if running is not None:
+            running.cancel()
         
         # Update task status
         task.status = TaskStatus.CANCELLED
@@ -176,11 +250,16 @@ class BackgroundTaskManager:
         logger.info(f"Cancelled task: {task.name} (ID: {task_id})")
         return True
     
+    def _lookup(self, task_id: str) -> Optional[BackgroundTask]:
+        """Resolve a public task ID to its task"""
+        key = self._keys.get(task_id)
+        return None if key is None else self.tasks.get(key)
+    
     async def get_queue_status(self) -> Dict[str, Any]:
         """Get queue and worker status"""
         return {
             "is_running": self.is_running,
-            "queue_size": self.task_queue.qsize(),
+            "queue_size": len(self._heap),
             "active_workers": len(self.workers),
             "running_tasks": len(self.running_tasks),
             "total_tasks": len(self.tasks),
@@ -193,81 +272,122 @@ class BackgroundTaskManager:
     async def _worker(self, worker_name: str):
         """Background worker to process tasks"""
         logger.info(f"Background worker {worker_name} started")
+        # Released by each attempt as it finishes, so a free slot is refilled
+        # straight away rather than after the rest of its dequeue batch
+        slots = asyncio.Semaphore(self.batch_size)
         
         while self.is_running:
             try:
-                # Get next task with timeout
-                task = await asyncio.wait_for(self.task_queue.get(), timeout=1.0)
-                
-                # Update task status
-                task.status = TaskStatus.RUNNING
-                task.started_at = datetime.now(timezone.utc)
-                
-                logger.info(f"Worker {worker_name} processing task: {task.name} (ID: {task.id})")
-                
-                # Create asyncio task for execution
-                execution_task = asyncio.create_task(self._execute_task(task))
-                self.running_tasks[task.id] = execution_task
-                
-                try:
-                    # Execute the task
-                    await execution_task
+                await slots.acquire()
+                # Take due, highest-priority tasks for every free slot in one
+                # critical section; idle workers sleep until add_task() or
+                # stop() notifies, or until the earliest retry becomes due
+                async with self._cv:
+                    heap = self._heap
+                    while self.is_running:
+                        if not heap:
+                            await self._cv.wait()
+                            continue
+                        delay_ns = heap[0][0] - time.monotonic_ns()
+                        if delay_ns <= 0:
+                            break
+                        try:
+                            await asyncio.wait_for(self._cv.wait(), delay_ns / 1e9)
+                        except asyncio.TimeoutError:
+                            pass
+                    if not self.is_running:
+                        break
                     
-                except asyncio.CancelledError:
-                    logger.info(f"Task cancelled: {task.name} (ID: {task.id})")
-                    task.status = TaskStatus.CANCELLED
+                    now_ns = time.monotonic_ns()
+                    batch = []
+                    while heap and heap[0][0] <= now_ns and (not batch or not slots.locked()):
+                        task = heapq.heappop(heap)[3]
+                        # Cancelled while waiting out a retry backoff
+                        if task.status is TaskStatus.CANCELLED:
+                            continue
+                        if batch:
+                            await slots.acquire()  # a slot is free; does not block
+                        batch.append(task)
                 
-                finally:
-                    # Cleanup
-                    if task.id in self.running_tasks:
-                        del self.running_tasks[task.id]
-                    
-                    task.completed_at = datetime.now(timezone.utc)
+                if batch:
+                    self._dispatch(worker_name, batch, slots)
+                else:
+                    slots.release()
                 
-            except asyncio.TimeoutError:
-                # No tasks in queue, continue
-                continue
-            
             except Exception as e:
                 logger.error(f"Worker {worker_name} error: {e}")
         
         logger.info(f"Background worker {worker_name} stopped")
     
+    def _dispatch(self, worker_name: str, batch: List[BackgroundTask], slots: asyncio.Semaphore):
+        """Start a batch of dequeued tasks; each attempt records its own outcome"""
+        # One clock read per dequeue, shared by every task in it
+        started_at = datetime.now(timezone.utc)
+        for task in batch:
+            # Update task status
+            task.status = TaskStatus.RUNNING
+            task.started_at = started_at
+            
+            logger.info(f"Worker {worker_name} processing task: {task.name} (ID: {task.id})")
+            
+            # Create asyncio task for execution; eager tasks run synchronously
+            # up to their first suspension and are never scheduled if they
+            # finish without one
+            execution = asyncio.eager_task_factory(self._loop, self._execute_task(task))
+            execution.add_done_callback(lambda _: slots.release())
+            if not execution.done():
+                self.running_tasks[task.key] = execution
+    
     async def _execute_task(self, task: BackgroundTask):
-        """Execute a single task with retry logic"""
-        for attempt in range(task.max_retries + 1):
-            try:
-                # Execute the function
-                if asyncio.iscoroutinefunction(task.function):
-                    result = await task.function(*task.args, **task.kwargs)
-                else:
-                    # Run sync function in executor
-                    result = await asyncio.get_event_loop().run_in_executor(
-                        None, task.function, *task.args
-                    )
-                
-                # Task completed successfully
-                task.status = TaskStatus.COMPLETED
-                task.result = result
-                
-                logger.info(f"Task completed successfully: {task.name} (ID: {task.id})")
+        """Execute one attempt of a task, requeueing it with backoff on failure"""
+        try:
+            # Execute the function
+            if asyncio.iscoroutinefunction(task.function):
+                result = await task.function(*task.args, **task.kwargs)
+            else:
+                # Run sync function in executor
+                result = await self._loop.run_in_executor(
+                    self._executor,
+                    functools.partial(task.function, *task.args, **task.kwargs)
+                )
+            
+            # Task completed successfully
+            task.status = TaskStatus.COMPLETED
+            task.result = result
+            task.result_is_json = _is_json_serializable(result)
+            
+            logger.info(f"Task completed successfully: {task.name} (ID: {task.id})")
+            
+        except Exception as e:
+            if task.status is TaskStatus.CANCELLED:
+                # cancel_task() ran while this attempt was in flight
                 return
-                
-            except Exception as e:
-                task.retry_count = attempt + 1
-                error_msg = f"Attempt {attempt + 1}/{task.max_retries + 1} failed: {str(e)}"
-                logger.warning(f"Task {task.name} (ID: {task.id}) - {error_msg}")
-                
-                if attempt < task.max_retries:
-                    # Wait before retry (exponential backoff)
-                    wait_time = min(2 ** attempt, 60)  # Max 60 seconds
-                    await asyncio.sleep(wait_time)
-                else:
-                    # Max retries reached
-                    task.status = TaskStatus.FAILED
-                    task.error_message = f"Failed after {task.max_retries + 1} attempts. Last error: {str(e)}"
-                    logger.error(f"Task failed permanently: {task.name} (ID: {task.id}) - {task.error_message}")
-                    return
+            attempt = task.retry_count
+            task.retry_count = attempt + 1
+            error_msg = f"Attempt {attempt + 1}/{task.max_retries + 1} failed: {str(e)}"
+            logger.warning(f"Task {task.name} (ID: {task.id}) - {error_msg}")
+            
+            if attempt < task.max_retries:
+                # Retry after exponential backoff without holding a worker:
+                # the task goes back on the heap with a not-before deadline
+                wait_time = min(2 ** attempt, 60)  # Max 60 seconds
+                task.status = TaskStatus.PENDING
+                await self._push(task, time.monotonic_ns() + wait_time * 1_000_000_000)
+            else:
+                # Max retries reached
+                task.status = TaskStatus.FAILED
+                task.error_message = f"Failed after {task.max_retries + 1} attempts. Last error: {str(e)}"
+                logger.error(f"Task failed permanently: {task.name} (ID: {task.id}) - {task.error_message}")
+        
+        except asyncio.CancelledError:
+            logger.info(f"Task cancelled: {task.name} (ID: {task.id})")
+            task.status = TaskStatus.CANCELLED
+            raise
+        
+        finally:
+            self.running_tasks.pop(task.key, None)
+            if task.status is not TaskStatus.PENDING:  # not requeued for retry
+                task.completed_at = datetime.now(timezone.utc)
 
 
 # Global task manager instance
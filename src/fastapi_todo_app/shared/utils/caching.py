@@ -5,11 +5,13 @@ Enhanced caching service with Redis integration
 import json
 import pickle
 from typing import Any, Optional, Union, Dict, List
-from functools import wraps
+from functools import lru_cache, wraps
 import asyncio
 import hashlib
 import logging
-from datetime import datetime, timedelta
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
 
 try:
     import redis.asyncio as redis
@@ -17,16 +19,106 @@ try:
 except ImportError:
     REDIS_AVAILABLE = False
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    from xxhash import xxh3_64_hexdigest as _key_digest
+except ImportError:
+    def _key_digest(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=8).hexdigest()
+
 logger = logging.getLogger(__name__)
 
+# Per-request [hits, misses] counters, installed by CacheMetricsMiddleware.
+# Cache code increments them without needing access to the Request object.
+request_cache_counters: ContextVar[Optional[List[int]]] = ContextVar(
+    "request_cache_counters", default=None
+)
+
+
+def _count_request_cache(hit: bool):
+    counters = request_cache_counters.get()
+    if counters is not None:
+        counters[0 if hit else 1] += 1
+
+
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+
+def _is_plain_json(value: Any) -> bool:
+    """Whether value round-trips through JSON unchanged
+
+    Only exact built-in types qualify: orjson would turn UUIDs, enums and
+    datetimes into strings and tuples into lists.
+    """
+    kind = type(value)
+    if kind in _JSON_SCALARS:
+        return True
+    if kind is list:
+        return all(_is_plain_json(item) for item in value)
+    if kind is dict:
+        return all(type(k) is str and _is_plain_json(v) for k, v in value.items())
+    return False
+
+
+def _serialize(value: Any) -> bytes:
+    """Encode a cache value, prefixed with a 1-byte format tag"""
+    if ORJSON_AVAILABLE and _is_plain_json(value):
+        try:
+            return b"J" + orjson.dumps(value)
+        except TypeError:  # e.g. ints beyond 64 bits
+            pass
+    if MSGPACK_AVAILABLE:
+        try:
+            # strict_types keeps tuples and subclasses out of msgpack, which
+            # would decode them as lists and base types
+            return b"M" + msgpack.packb(value, use_bin_type=True, strict_types=True)
+        except (TypeError, ValueError):
+            pass
+    return b"P" + pickle.dumps(value, protocol=5)
+
+
+def _deserialize(data: bytes) -> Any:
+    """Decode a value written by _serialize"""
+    tag = data[:1]
+    body = memoryview(data)[1:]
+    if tag == b"J":
+        # Only plain JSON is tagged J, so the stdlib decoder reads it too
+        return orjson.loads(body) if ORJSON_AVAILABLE else json.loads(bytes(body))
+    if tag == b"M":
+        if not MSGPACK_AVAILABLE:
+            raise ValueError("Cache entry is msgpack-encoded but msgpack is not installed")
+        return msgpack.unpackb(body, raw=False)
+    if tag == b"P":
+        return pickle.loads(body)
+    # Untagged pickle written before format tags were introduced
+    return pickle.loads(data)
+
+
+@lru_cache(maxsize=256)
+def _encoded_prefix(prefix: str) -> bytes:
+    return prefix.encode()
+
 
 class CacheService:
     """Enhanced caching service with Redis and in-memory fallback"""
     
-    def __init__(self, redis_url: Optional[str] = None, default_ttl: int = 300):
+    def __init__(self, redis_url: Optional[str] = None, default_ttl: int = 300, max_entries: int = 10_000):
         self.default_ttl = default_ttl
         self.redis_client = None
-        self._memory_cache: Dict[str, Dict[str, Any]] = {}
+        # In-memory fallback: key -> (expiry monotonic ns, value), in LRU order
+        self._memory_cache: "OrderedDict[str, tuple[int, Any]]" = OrderedDict()
+        self.max_entries = max_entries
         
         if REDIS_AVAILABLE and redis_url:
             self.redis_client = redis.from_url(redis_url)
@@ -40,13 +132,15 @@ class CacheService:
             if self.redis_client:
                 value = await self.redis_client.get(key)
                 if value:
-                    return pickle.loads(value)
+                    return _deserialize(value)
             else:
                 # Memory cache fallback
                 cache_entry = self._memory_cache.get(key)
-                if cache_entry and cache_entry["expires"] > datetime.now():
-                    return cache_entry["value"]
-                elif cache_entry:
+                if cache_entry is not None:
+                    expires_ns, value = cache_entry
+                    if expires_ns > time.monotonic_ns():
+                        self._memory_cache.move_to_end(key)
+                        return value
                     # Expired entry
                     del self._memory_cache[key]
             
@@ -61,20 +155,54 @@ class CacheService:
             ttl = ttl or self.default_ttl
             
             if self.redis_client:
-                serialized_value = pickle.dumps(value)
+                serialized_value = _serialize(value)
                 await self.redis_client.setex(key, ttl, serialized_value)
             else:
-                # Memory cache fallback
-                self._memory_cache[key] = {
-                    "value": value,
-                    "expires": datetime.now() + timedelta(seconds=ttl)
-                }
+                # Memory cache fallback, evicting the least recently used entry
+                cache = self._memory_cache
+                cache[key] = (time.monotonic_ns() + ttl * 1_000_000_000, value)
+                cache.move_to_end(key)
+                if len(cache) > self.max_entries:
+                    cache.popitem(last=False)
             
             return True
         except Exception as e:
             logger.error(f"Cache set error: {e}")
             return False
     
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get many values in one Redis round-trip (None for missing keys)"""
+        if not self.redis_client:
+            return [await self.get(key) for key in keys]
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipe.get(key)
+            raw_values = await pipe.execute()
+            return [_deserialize(raw) if raw else None for raw in raw_values]
+        except Exception as e:
+            logger.error(f"Cache mget error: {e}")
+            return [None] * len(keys)
+    
+    async def mset(self, items: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """Set many values in one Redis round-trip"""
+        ttl = ttl or self.default_ttl
+        if not self.redis_client:
+            for key, value in items.items():
+                await self.set(key, value, ttl)
+            return True
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.setex(key, ttl, _serialize(value))
+            await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Cache mset error: {e}")
+            return False
+    
     async def delete(self, key: str) -> bool:
         """Delete key from cache"""
         try:
@@ -103,11 +231,18 @@ class CacheService:
     
     def generate_key(self, prefix: str, *args, **kwargs) -> str:
         """Generate cache key from arguments"""
-        key_data = f"{prefix}:{':'.join(map(str, args))}"
+        buf = bytearray(_encoded_prefix(prefix))
+        for arg in args:
+            buf += b":"
+            buf += str(arg).encode()
         if kwargs:
-            key_data += f":{':'.join(f'{k}={v}' for k, v in sorted(kwargs.items()))}"
+            # Sorting only matters when call sites may order kwargs differently
+            names = sorted(kwargs) if len(kwargs) > 1 else kwargs
+            for name in names:
+                buf += b":%s=%s" % (name.encode(), str(kwargs[name]).encode())
         
-        return hashlib.md5(key_data.encode()).hexdigest()
+        # Non-cryptographic 64-bit digest; the prefix stays readable for debugging
+        return f"{prefix}:{_key_digest(buf)}"
 
 
 # Global cache instance
@@ -117,6 +252,9 @@ cache_service = CacheService()
 def cached(ttl: int = 300, key_prefix: str = "default"):
     """Decorator for caching function results"""
     def decorator(func):
+        # Single-flight: concurrent misses on the same key share one computation
+        inflight: Dict[str, asyncio.Future] = {}
+        
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # Generate cache key
@@ -125,15 +263,43 @@ def cached(ttl: int = 300, key_prefix: str = "default"):
             # Try to get from cache
             cached_result = await cache_service.get(cache_key)
             if cached_result is not None:
+                _count_request_cache(True)
                 logger.debug(f"Cache hit for key: {cache_key}")
                 return cached_result
             
+            _count_request_cache(False)
+            
+            # Another caller is already computing this key; wait for its result
+            while (pending := inflight.get(cache_key)) is not None:
+                try:
+                    return await asyncio.shield(pending)
+                except asyncio.CancelledError:
+                    # Only the leader was cancelled (e.g. its client went
+                    # away); compute the value here instead
+                    if not pending.cancelled() or asyncio.current_task().cancelling():
+                        raise
+            
             # Execute function and cache result
             logger.debug(f"Cache miss for key: {cache_key}")
-            result = await func(*args, **kwargs)
-            await cache_service.set(cache_key, result, ttl)
-            
-            return result
+            future = asyncio.get_running_loop().create_future()
+            inflight[cache_key] = future
+            try:
+                result = await func(*args, **kwargs)
+                await cache_service.set(cache_key, result, ttl)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                # Mark retrieved so an unawaited failure is not logged by asyncio
+                future.exception()
+                raise
+            else:
+                future.set_result(result)
+                return result
+            finally:
+                if inflight.get(cache_key) is future:
+                    del inflight[cache_key]
         
         return wrapper
     return decorator
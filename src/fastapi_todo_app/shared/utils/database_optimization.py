@@ -3,13 +3,17 @@ Database query optimization utilities
 """
 
 import asyncio
-from typing import Any, Dict, List, Optional, Union, Type, Tuple
-from sqlalchemy import text, select, func, and_, or_
+import operator
+import numpy as np
+from typing import Any, AsyncIterator, Dict, List, Optional, Union, Type, Tuple
+from sqlalchemy import text, select, func, and_, or_, insert, update, values, column
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload, joinedload, contains_eager
 from sqlalchemy.sql import Select
 from contextlib import asynccontextmanager
+from functools import cache
 import logging
+from collections import deque
 from datetime import datetime, timezone
 from dataclasses import dataclass
 
@@ -35,7 +39,14 @@ class QueryOptimizer:
     """Database query optimization and monitoring"""
     
     def __init__(self):
-        self.query_metrics: List[QueryPerformanceMetrics] = []
+        # Ring buffer of the most recent 1000 query metrics, mirrored as
+        # NumPy columns so aggregate stats are vectorized reductions
+        self.max_metrics = 1000
+        self.query_metrics: deque[QueryPerformanceMetrics] = deque(maxlen=self.max_metrics)
+        self._execution_times = np.zeros(self.max_metrics, dtype=np.float64)
+        self._cache_hits = np.zeros(self.max_metrics, dtype=bool)
+        self._head = 0
+        self._filled = 0
         self.slow_query_threshold = 1.0  # seconds
         self.query_cache: Dict[str, Tuple[Any, datetime]] = {}
         self.cache_ttl = 300  # 5 minutes
@@ -43,12 +54,13 @@ class QueryOptimizer:
     @asynccontextmanager
     async def track_query(self, session: AsyncSession, query_name: str = ""):
         """Context manager for tracking query performance"""
-        start_time = asyncio.get_event_loop().time()
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
         
         try:
             yield session
         finally:
-            execution_time = asyncio.get_event_loop().time() - start_time
+            execution_time = loop.time() - start_time
             
             # Log slow queries
             if execution_time > self.slow_query_threshold:
@@ -64,11 +76,18 @@ class QueryOptimizer:
                 timestamp=datetime.now(timezone.utc)
             )
             
-            self.query_metrics.append(metrics)
-            
-            # Keep only recent metrics (last 1000)
-            if len(self.query_metrics) > 1000:
-                self.query_metrics = self.query_metrics[-1000:]
+            self._record_metrics(metrics)
+    
+    def _record_metrics(self, metrics: QueryPerformanceMetrics):
+        """Append to the metrics ring buffer and its NumPy columns"""
+        self.query_metrics.append(metrics)
+        
+        i = self._head
+        self._execution_times[i] = metrics.execution_time
+        self._cache_hits[i] = metrics.cache_hit
+        self._head = (i + 1) % self.max_metrics
+        if self._filled < self.max_metrics:
+            self._filled += 1
     
     def get_slow_queries(self, threshold: Optional[float] = None) -> List[QueryPerformanceMetrics]:
         """Get queries that exceeded the slow query threshold"""
@@ -77,22 +96,41 @@ class QueryOptimizer:
     
     def get_query_stats(self) -> Dict[str, Any]:
         """Get comprehensive query statistics"""
-        if not self.query_metrics:
+        total = self._filled
+        if not total:
             return {"message": "No query metrics available"}
         
-        execution_times = [m.execution_time for m in self.query_metrics]
+        execution_times = self._execution_times[:total]
+        cache_hits = int(np.count_nonzero(self._cache_hits[:total]))
         
         return {
-            "total_queries": len(self.query_metrics),
-            "average_execution_time": sum(execution_times) / len(execution_times),
-            "min_execution_time": min(execution_times),
-            "max_execution_time": max(execution_times),
-            "slow_queries_count": len(self.get_slow_queries()),
-            "cache_hits": sum(1 for m in self.query_metrics if m.cache_hit),
-            "cache_hit_ratio": sum(1 for m in self.query_metrics if m.cache_hit) / len(self.query_metrics),
+            "total_queries": total,
+            "average_execution_time": float(execution_times.mean()),
+            "min_execution_time": float(execution_times.min()),
+            "max_execution_time": float(execution_times.max()),
+            "slow_queries_count": int(np.count_nonzero(execution_times > self.slow_query_threshold)),
+            "cache_hits": cache_hits,
+            "cache_hit_ratio": cache_hits / total,
         }
 
 
+# Range/text filter operators accepted in dict-valued filters
+FILTER_OPS = {
+    'gte': operator.ge,
+    'lte': operator.le,
+    'gt': operator.gt,
+    'lt': operator.lt,
+    'contains': lambda attr, value: attr.contains(value),
+    'startswith': lambda attr, value: attr.startswith(value),
+}
+
+
+@cache
+def _model_attr(model_class: Type, field: str) -> Any:
+    """Mapped attribute for a filter field, or None if the model lacks it"""
+    return getattr(model_class, field, None)
+
+
 class EfficientQueryBuilder:
     """Build efficient database queries with optimizations"""
     
@@ -114,7 +152,8 @@ class EfficientQueryBuilder:
         # Build paginated query
         paginated_query = base_query.offset(offset).limit(page_size)
         
-        # Build count query (remove ordering for efficiency)
+        # Build count query (remove ordering for efficiency); execute it with
+        # session.scalar() so the count skips ORM row processing
         count_query = select(func.count()).select_from(base_query.alias())
         
         return paginated_query, count_query
@@ -144,29 +183,20 @@ class EfficientQueryBuilder:
             if value is None:
                 continue
             
-            if not hasattr(model_class, field):
+            attr = _model_attr(model_class, field)
+            if attr is None:
                 continue
             
-            attr = getattr(model_class, field)
-            
             # Handle different filter types
             if isinstance(value, list):
                 # IN clause for lists
                 base_query = base_query.where(attr.in_(value))
             elif isinstance(value, dict):
-                # Handle range queries, etc.
-                if 'gte' in value:
-                    base_query = base_query.where(attr >= value['gte'])
-                if 'lte' in value:
-                    base_query = base_query.where(attr <= value['lte'])
-                if 'gt' in value:
-                    base_query = base_query.where(attr > value['gt'])
-                if 'lt' in value:
-                    base_query = base_query.where(attr < value['lt'])
-                if 'contains' in value:
-                    base_query = base_query.where(attr.contains(value['contains']))
-                if 'startswith' in value:
-                    base_query = base_query.where(attr.startswith(value['startswith']))
+                # Handle range queries, etc.; unknown operators are ignored
+                for op, operand in value.items():
+                    apply_op = FILTER_OPS.get(op)
+                    if apply_op is not None:
+                        base_query = base_query.where(apply_op(attr, operand))
             else:
                 # Exact match
                 base_query = base_query.where(attr == value)
@@ -182,24 +212,28 @@ class BatchProcessor:
         session: AsyncSession,
         model_class: Type,
         data_list: List[Dict[str, Any]],
-        batch_size: int = 100
+        batch_size: int = 100,
+        return_objects: bool = True
     ) -> List[Any]:
-        """Efficiently insert multiple records in batches"""
+        """Efficiently insert multiple records in batches
+        
+        Each batch is a single multi-row INSERT ... RETURNING. Returns the
+        inserted ORM objects, or only their primary keys when
+        return_objects is False (skipping ORM hydration).
+        """
         inserted_objects = []
         
+        if return_objects:
+            stmt = insert(model_class).returning(model_class)
+        else:
+            stmt = insert(model_class.__table__).returning(model_class.__table__.c.id)
+        
         for i in range(0, len(data_list), batch_size):
             batch = data_list[i:i + batch_size]
             
-            # Create model instances
-            objects = [model_class(**data) for data in batch]
-            
-            # Add to session
-            session.add_all(objects)
-            
-            # Flush to get IDs
-            await session.flush()
-            
-            inserted_objects.extend(objects)
+            # executemany with RETURNING is batched via insertmanyvalues
+            result = await session.scalars(stmt, batch)
+            inserted_objects.extend(result.all())
             
             # Log progress
             logger.debug(f"Inserted batch {i//batch_size + 1}: {len(batch)} records")
@@ -215,23 +249,38 @@ class BatchProcessor:
     ) -> int:
         """Efficiently update multiple records in batches"""
         total_updated = 0
+        table = model_class.__table__
         
         for i in range(0, len(updates), batch_size):
             batch = updates[i:i + batch_size]
             
+            # Rows that update the same set of columns share one
+            # UPDATE ... FROM (VALUES ...) statement
+            groups: Dict[Tuple[str, ...], List[tuple]] = {}
             for update_data in batch:
-                # Extract ID and update data
-                record_id = update_data.pop('id')
+                columns = tuple(sorted(k for k in update_data if k != 'id'))
+                groups.setdefault(columns, []).append(
+                    (update_data['id'], *(update_data[name] for name in columns))
+                )
+            
+            for columns, rows in groups.items():
+                if not columns:
+                    continue
+                
+                batch_values = values(
+                    *(column(name, table.c[name].type) for name in ('id', *columns)),
+                    name="batch_values"
+                ).data(rows)
                 
-                # Build update query
-                query = (
-                    session.query(model_class)
-                    .filter(model_class.id == record_id)
+                stmt = (
+                    update(table)
+                    .where(table.c.id == batch_values.c.id)
+                    .values({name: batch_values.c[name] for name in columns})
                 )
                 
                 # Execute update
-                result = await query.update(update_data)
-                total_updated += result.rowcount if result else 0
+                result = await session.execute(stmt)
+                total_updated += result.rowcount
             
             logger.debug(f"Updated batch {i//batch_size + 1}: {len(batch)} records")
         
@@ -321,25 +370,51 @@ async def execute_with_retry(
 async def bulk_fetch_with_cursor(
     session: AsyncSession,
     query: Select,
+    key_column: Any,
     chunk_size: int = 1000
-) -> List[Any]:
-    """Fetch large result sets efficiently using cursor"""
-    results = []
-    offset = 0
+) -> AsyncIterator[Any]:
+    """Stream large result sets using keyset pagination on key_column
+    
+    Memory stays bounded by chunk_size, and each chunk seeks past the last
+    key seen instead of scanning skipped rows with OFFSET.
+    """
+    ordered_query = query.order_by(None).order_by(key_column).limit(chunk_size)
+    last_key = None
+    fetched = 0
     
     while True:
-        chunk_query = query.offset(offset).limit(chunk_size)
+        chunk_query = ordered_query if last_key is None else ordered_query.where(key_column > last_key)
         chunk_result = await session.execute(chunk_query)
         chunk_data = chunk_result.scalars().all()
         
         if not chunk_data:
             break
         
-        results.extend(chunk_data)
-        offset += chunk_size
+        for row in chunk_data:
+            yield row
+        
+        last_key = getattr(chunk_data[-1], key_column.key)
+        fetched += len(chunk_data)
         
         # Log progress for very large datasets
-        if offset % 10000 == 0:
-            logger.info(f"Fetched {offset} records...")
+        if fetched % 10000 == 0:
+            logger.info(f"Fetched {fetched} records...")
+        
+        if len(chunk_data) < chunk_size:
+            break
+
+
+async def stream_rows(
+    session: AsyncSession,
+    query: Select
+) -> AsyncIterator[Dict[str, Any]]:
+    """Stream query results as plain dicts, bypassing ORM hydration
     
-    return results
\ No newline at end of file
+    Rows come from a server-side cursor via session.stream(), so mapped
+    objects, the identity map and relationship eager loading are skipped.
+    Callers that need relationships should use EfficientQueryBuilder's
+    add_eager_loading with a regular ORM query instead.
+    """
+    result = await session.stream(query)
+    async for row in result.mappings():
+        yield dict(row)
@@ -1,15 +1,24 @@
 """
 Rate limiting service with multiple strategies
+
+Locking invariant: the only code run under a shard lock is the dict
+insert-if-missing in RateLimitService._get_or_create. Limiter checks, clock
+reads and result construction all happen after the lock is released, and no
+I/O or await may ever be added under a shard lock, so callers for different
+identifiers never wait on each other.
 """
 
 import time
+from array import array
+from bisect import bisect_right
 import asyncio
-from typing import Dict, Optional, Tuple, Any
-from collections import defaultdict, deque
+from typing import Optional, Tuple, Any
+from collections import defaultdict
 from dataclasses import dataclass
 from enum import Enum
 import hashlib
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -38,111 +47,222 @@ class RateLimitResult:
     retry_after: Optional[int] = None
 
 
+# TokenBucket state word layout: micro-tokens above the low 64 bits, last
+# refill time (monotonic microseconds since bucket creation) in the low bits
+_TOKEN_SCALE = 1_000_000
+_TIME_BITS = 64
+_TIME_MASK = (1 << _TIME_BITS) - 1
+
+
 class TokenBucket:
-    """Token bucket implementation"""
+    """Token bucket implementation
+    
+    The whole bucket state is one packed int. Updates compute a new state
+    from a single snapshot and publish it with compare-and-swap, retrying if
+    another thread got there first, so tokens can never be double-spent.
+    """
     
     def __init__(self, capacity: int, refill_rate: float):
         self.capacity = capacity
-        self.tokens = capacity
         self.refill_rate = refill_rate
-        self.last_refill = time.time()
+        self._origin_ns = time.monotonic_ns()
+        self._state = (capacity * _TOKEN_SCALE) << _TIME_BITS
+        # Held only for the compare-and-store itself
+        self._cas_lock = threading.Lock()
     
-    def consume(self, tokens: int = 1) -> bool:
-        """Try to consume tokens"""
-        now = time.time()
-        self._refill(now)
-        
-        if self.tokens >= tokens:
-            self.tokens -= tokens
+    def _now_us(self) -> int:
+        return (time.monotonic_ns() - self._origin_ns) // 1000
+    
+    def _refilled(self, state: int, now_us: int) -> int:
+        """Micro-tokens available at now_us for a given state word"""
+        micro_tokens = state >> _TIME_BITS
+        last_us = state & _TIME_MASK
+        if now_us > last_us:
+            # elapsed µs * tokens/s == micro-tokens to add
+            micro_tokens = min(
+                self.capacity * _TOKEN_SCALE,
+                micro_tokens + int((now_us - last_us) * self.refill_rate)
+            )
+        return micro_tokens
+    
+    def _compare_and_swap(self, expected: int, new: int) -> bool:
+        with self._cas_lock:
+            if self._state != expected:
+                return False
+            self._state = new
             return True
-        return False
     
-    def _refill(self, now: float):
-        """Refill tokens based on elapsed time"""
-        if now > self.last_refill:
-            elapsed = now - self.last_refill
-            tokens_to_add = elapsed * self.refill_rate
-            self.tokens = min(self.capacity, self.tokens + tokens_to_add)
-            self.last_refill = now
+    def try_consume(self, tokens: int = 1) -> Tuple[bool, int]:
+        """Try to consume tokens; returns (allowed, whole tokens remaining)"""
+        cost = tokens * _TOKEN_SCALE
+        while True:
+            old = self._state
+            now_us = self._now_us()
+            micro_tokens = self._refilled(old, now_us)
+            
+            allowed = micro_tokens >= cost
+            if allowed:
+                micro_tokens -= cost
+            
+            new = (micro_tokens << _TIME_BITS) | max(now_us, old & _TIME_MASK)
+            if self._compare_and_swap(old, new):
+                return allowed, micro_tokens // _TOKEN_SCALE
+    
+    def consume(self, tokens: int = 1) -> bool:
+        """Try to consume tokens"""
+        return self.try_consume(tokens)[0]
     
     @property
     def remaining_tokens(self) -> int:
-        now = time.time()
-        self._refill(now)
-        return int(self.tokens)
+        return self._refilled(self._state, self._now_us()) // _TOKEN_SCALE
+    
+    def is_idle(self) -> bool:
+        """A fully refilled bucket carries no state worth keeping"""
+        return self._refilled(self._state, self._now_us()) >= self.capacity * _TOKEN_SCALE
 
 
 class SlidingWindow:
-    """Sliding window implementation"""
+    """Sliding window implementation
+    
+    Request timestamps live in a fixed-capacity array used as a ring buffer:
+    head is the oldest entry, tail the next free slot, so admitting and
+    expiring requests only moves indices and never allocates. Timestamps come
+    from time.monotonic(), keeping the live region sorted for bisect.
+    """
     
     def __init__(self, capacity: int, window: int):
         self.capacity = capacity
         self.window = window
-        self.requests = deque()
+        self.ts = array('d', [0.0]) * capacity
+        self.head = self.tail = self.count = 0
+    
+    def _expire(self, cutoff: float):
+        """Drop timestamps at or before cutoff from the head of the ring"""
+        ts, head, count, capacity = self.ts, self.head, self.count, self.capacity
+        if not count:
+            return
+        end = head + count
+        if end <= capacity:
+            expired = bisect_right(ts, cutoff, head, end) - head
+        elif ts[capacity - 1] <= cutoff:
+            # Live region wraps and its first run has fully expired
+            expired = capacity - head + bisect_right(ts, cutoff, 0, end - capacity)
+        else:
+            expired = bisect_right(ts, cutoff, head, capacity) - head
+        self.head = (head + expired) % capacity
+        self.count = count - expired
     
     def is_allowed(self) -> Tuple[bool, int]:
         """Check if request is allowed"""
-        now = time.time()
-        cutoff = now - self.window
-        
-        # Remove old requests
-        while self.requests and self.requests[0] <= cutoff:
-            self.requests.popleft()
+        now = time.monotonic()
+        self._expire(now - self.window)
         
         # Check capacity
-        if len(self.requests) < self.capacity:
-            self.requests.append(now)
-            return True, self.capacity - len(self.requests)
+        if self.count < self.capacity:
+            self.ts[self.tail] = now
+            self.tail = (self.tail + 1) % self.capacity
+            self.count += 1
+            return True, self.capacity - self.count
         
         return False, 0
     
     @property
     def remaining(self) -> int:
-        now = time.time()
-        cutoff = now - self.window
-        
-        # Remove old requests
-        while self.requests and self.requests[0] <= cutoff:
-            self.requests.popleft()
+        self._expire(time.monotonic() - self.window)
+        return max(0, self.capacity - self.count)
+    
+    def is_idle(self) -> bool:
+        """Whether every stored timestamp has left the window
         
-        return max(0, self.capacity - len(self.requests))
+        Called from the sweeper thread, so it only reads: mutating head/count
+        here could lose an update racing is_allowed().
+        """
+        count = self.count
+        return count == 0 or self.ts[(self.tail - 1) % self.capacity] <= time.monotonic() - self.window
+
+
+_COUNT_BITS = 32
+_COUNT_MASK = (1 << _COUNT_BITS) - 1
 
 
 class FixedWindow:
-    """Fixed window implementation"""
+    """Fixed window implementation
+    
+    Windows are numbered by monotonic_ns() // window_ns, so wall clock jumps
+    cannot cause spurious resets. State is one packed int,
+    (window index << 32) | count, updated by compare-and-swap like TokenBucket.
+    """
     
     def __init__(self, capacity: int, window: int):
         self.capacity = capacity
         self.window = window
-        self.count = 0
-        self.window_start = time.time()
+        self._window_ns = window * 1_000_000_000
+        # Maps monotonic seconds onto the wall clock for reset_time
+        self._wall_offset = time.time() - time.monotonic_ns() / 1e9
+        self._state = (time.monotonic_ns() // self._window_ns) << _COUNT_BITS
+        self._cas_lock = threading.Lock()
+    
+    def _compare_and_swap(self, expected: int, new: int) -> bool:
+        with self._cas_lock:
+            if self._state != expected:
+                return False
+            self._state = new
+            return True
     
     def is_allowed(self) -> Tuple[bool, int, float]:
         """Check if request is allowed"""
-        now = time.time()
-        
-        # Reset window if expired
-        if now >= self.window_start + self.window:
-            self.count = 0
-            self.window_start = now
-        
-        # Check capacity
-        if self.count < self.capacity:
-            self.count += 1
-            reset_time = self.window_start + self.window
-            return True, self.capacity - self.count, reset_time
-        
-        reset_time = self.window_start + self.window
-        return False, 0, reset_time
+        while True:
+            old = self._state
+            now_idx = time.monotonic_ns() // self._window_ns
+            reset_time = (now_idx + 1) * self.window + self._wall_offset
+            
+            if old >> _COUNT_BITS != now_idx:
+                # Window expired: start a new one with this request counted
+                new = (now_idx << _COUNT_BITS) | 1
+            elif old & _COUNT_MASK < self.capacity:
+                new = old + 1
+            else:
+                return False, 0, reset_time
+            
+            if self._compare_and_swap(old, new):
+                return True, self.capacity - (new & _COUNT_MASK), reset_time
+    
+    def is_idle(self) -> bool:
+        return self._state >> _COUNT_BITS != time.monotonic_ns() // self._window_ns
+
+
+# Limiter maps are split into shards, each with its own lock, indexed by
+# hash(key) & (N_SHARDS - 1)
+N_SHARDS = 64
+_BUCKETS, _WINDOWS, _FIXED_WINDOWS = 1, 2, 3
 
 
 class RateLimitService:
     """Rate limiting service with multiple strategies"""
     
-    def __init__(self):
-        self._buckets: Dict[str, TokenBucket] = {}
-        self._windows: Dict[str, SlidingWindow] = {}
-        self._fixed_windows: Dict[str, FixedWindow] = {}
+    def __init__(self, sweep_interval: float = 60.0):
+        # Each shard: (lock, token buckets, sliding windows, fixed windows),
+        # keyed by (identifier, requests, window)
+        self._shards = [(threading.Lock(), {}, {}, {}) for _ in range(N_SHARDS)]
+        self.sweep_interval = sweep_interval
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_stop = threading.Event()
+    
+    def _get_or_create(self, kind: int, key: Tuple[str, int, int], factory):
+        """Look up a limiter, creating it under its shard lock if missing
+        
+        The lock covers only the re-check and insert; the caller consults the
+        returned limiter after it has been released.
+        """
+        shard = self._shards[hash(key) & (N_SHARDS - 1)]
+        limiters = shard[kind]
+        limiter = limiters.get(key)
+        if limiter is None:
+            with shard[0]:
+                limiter = limiters.get(key)
+                if limiter is None:
+                    limiter = limiters[key] = factory()
+        return limiter
     
     def check_rate_limit(
         self, 
@@ -151,6 +271,8 @@ class RateLimitService:
         tokens: int = 1
     ) -> RateLimitResult:
         """Check if request is within rate limit"""
+        if self._sweeper is None:
+            self._start_sweeper()
         
         if rate_limit.strategy == RateLimitStrategy.TOKEN_BUCKET:
             return self._check_token_bucket(identifier, rate_limit, tokens)
@@ -168,22 +290,20 @@ class RateLimitService:
         tokens: int
     ) -> RateLimitResult:
         """Check token bucket rate limit"""
-        bucket_key = f"bucket:{identifier}:{rate_limit.requests}:{rate_limit.window}"
-        
-        if bucket_key not in self._buckets:
-            refill_rate = rate_limit.requests / rate_limit.window
-            self._buckets[bucket_key] = TokenBucket(rate_limit.requests, refill_rate)
+        bucket_key = (identifier, rate_limit.requests, rate_limit.window)
         
-        bucket = self._buckets[bucket_key]
-        allowed = bucket.consume(tokens)
-        remaining = bucket.remaining_tokens
-        reset_time = time.time() + (rate_limit.requests - remaining) / (rate_limit.requests / rate_limit.window)
+        bucket = self._get_or_create(
+            _BUCKETS, bucket_key,
+            lambda: TokenBucket(rate_limit.requests, rate_limit.requests / rate_limit.window)
+        )
+        allowed, remaining = bucket.try_consume(tokens)
         
+        refill_seconds = (rate_limit.requests - remaining) / (rate_limit.requests / rate_limit.window)
         return RateLimitResult(
             allowed=allowed,
             remaining=remaining,
-            reset_time=reset_time,
-            retry_after=int(reset_time - time.time()) if not allowed else None
+            reset_time=time.time() + refill_seconds,
+            retry_after=int(refill_seconds) if not allowed else None
         )
     
     def _check_sliding_window(
@@ -192,12 +312,12 @@ class RateLimitService:
         rate_limit: RateLimit
     ) -> RateLimitResult:
         """Check sliding window rate limit"""
-        window_key = f"sliding:{identifier}:{rate_limit.requests}:{rate_limit.window}"
-        
-        if window_key not in self._windows:
-            self._windows[window_key] = SlidingWindow(rate_limit.requests, rate_limit.window)
+        window_key = (identifier, rate_limit.requests, rate_limit.window)
         
-        window = self._windows[window_key]
+        window = self._get_or_create(
+            _WINDOWS, window_key,
+            lambda: SlidingWindow(rate_limit.requests, rate_limit.window)
+        )
         allowed, remaining = window.is_allowed()
         reset_time = time.time() + rate_limit.window
         
@@ -214,12 +334,12 @@ class RateLimitService:
         rate_limit: RateLimit
     ) -> RateLimitResult:
         """Check fixed window rate limit"""
-        fixed_key = f"fixed:{identifier}:{rate_limit.requests}:{rate_limit.window}"
-        
-        if fixed_key not in self._fixed_windows:
-            self._fixed_windows[fixed_key] = FixedWindow(rate_limit.requests, rate_limit.window)
+        fixed_key = (identifier, rate_limit.requests, rate_limit.window)
         
-        window = self._fixed_windows[fixed_key]
+        window = self._get_or_create(
+            _FIXED_WINDOWS, fixed_key,
+            lambda: FixedWindow(rate_limit.requests, rate_limit.window)
+        )
         allowed, remaining, reset_time = window.is_allowed()
         
         return RateLimitResult(
@@ -240,10 +360,48 @@ class RateLimitService:
         client_ip = request.client.host if request.client else "unknown"
         return f"ip:{client_ip}"
     
-    def cleanup_expired(self):
-        """Cleanup expired rate limit entries"""
-        # This could be enhanced to remove old entries periodically
-        pass
+    def cleanup_expired(self) -> int:
+        """Evict limiters that are back at full capacity; returns the count removed"""
+        removed = 0
+        for shard in self._shards:
+            lock = shard[0]
+            for limiters in shard[1:]:
+                idle_keys = [key for key, limiter in list(limiters.items()) if limiter.is_idle()]
+                if not idle_keys:
+                    continue
+                with lock:
+                    for key in idle_keys:
+                        if limiters.pop(key, None) is not None:
+                            removed += 1
+        return removed
+    
+    def _start_sweeper(self):
+        """Lazily start the single background thread that evicts idle limiters"""
+        with self._shards[0][0]:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, name="rate-limit-sweeper", daemon=True
+            )
+            self._sweeper.start()
+    
+    def stop_sweeper(self):
+        """Stop the background eviction thread (called from app lifespan shutdown)"""
+        with self._shards[0][0]:
+            sweeper, self._sweeper = self._sweeper, None
+        if sweeper is not None:
+            self._sweeper_stop.set()
+            sweeper.join()
+            self._sweeper_stop.clear()
+    
+    def _sweep_loop(self):
+        while not self._sweeper_stop.wait(self.sweep_interval):
+            try:
+                removed = self.cleanup_expired()
+                if removed:
+                    logger.debug(f"Evicted {removed} idle rate limiters")
+            except Exception as e:
+                logger.error(f"Rate limiter sweep error: {e}")
 
 
 # Global rate limit service
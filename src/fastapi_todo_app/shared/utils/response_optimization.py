@@ -4,17 +4,145 @@ API response optimization and streaming utilities
 
 import asyncio
 import json
-from typing import Any, AsyncGenerator, Dict, List, Optional, Union
+import sys
+import time
+from typing import Any, AsyncGenerator, Dict, Hashable, List, Optional, Tuple, Union
 from fastapi import Response, status
 from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.encoders import jsonable_encoder
-import gzip
+from pydantic import BaseModel
 import logging
+import os
+import zlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from collections import OrderedDict
 from contextlib import asynccontextmanager
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    # Non-string keys are stringified, as the stdlib encoder does
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# ZstdCompressor instances must not be shared between threads
+_zstd_local = threading.local()
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    cctx = getattr(_zstd_local, "cctx", None)
+    if cctx is None:
+        cctx = _zstd_local.cctx = zstandard.ZstdCompressor(level=3)
+    return cctx.compress(data)
+
+
+def gzip_bytes(data: bytes, compresslevel: int = 6) -> bytes:
+    """One-shot gzip producing the final bytes in a single allocation
+    
+    gzip.compress() rewrites the header mtime by concatenating a new header
+    onto a slice of zlib's output, copying the body twice more; zlib with
+    wbits=31 already emits a complete gzip member (mtime 0).
+    """
+    return zlib.compress(data, compresslevel, wbits=31)
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return _zstd_compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=4)
+    return gzip_bytes(body)
+
+
+# Compression releases the GIL inside the codec, so async callers offload it
+# here and compress several responses in parallel
+_cpu_pool = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="response-compress")
+
+
+# (epoch second, formatted X-Timestamp) reused for every response in that second
+_ts_cache: Tuple[int, str] = (0, "")
+
+
+def _timestamp_header() -> str:
+    global _ts_cache
+    now = int(time.time())
+    if _ts_cache[0] != now:
+        _ts_cache = (now, datetime.fromtimestamp(now, timezone.utc).isoformat())
+    return _ts_cache[1]
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported codec from an Accept-Encoding header
+    
+    Preference is zstd, then br, then gzip, limited to codecs installed here.
+    """
+    accepted = set()
+    for token in accept_encoding.lower().split(","):
+        coding, _, params = token.partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip())
+    
+    if ZSTD_AVAILABLE and "zstd" in accepted:
+        return "zstd"
+    if BROTLI_AVAILABLE and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def _encode_default(value: Any) -> Any:
+    """Fallback for values orjson cannot serialize natively (pydantic models etc.)"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", by_alias=True)
+    return jsonable_encoder(value)
+
+
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+
+def _needs_encoding(obj: Any) -> bool:
+    """True unless obj is built only from JSON-native dicts, lists and scalars
+    
+    Stops at the first value that jsonable_encoder would have to convert, so
+    plain payloads are checked without building a copy.
+    """
+    if isinstance(obj, _JSON_SCALARS):
+        return False
+    if isinstance(obj, dict):
+        return any(not isinstance(k, str) or _needs_encoding(v) for k, v in obj.items())
+    if isinstance(obj, list):
+        return any(_needs_encoding(v) for v in obj)
+    return True
+
+
+def dumps_json_bytes(value: Any) -> bytes:
+    """Serialize value straight to JSON bytes, using orjson when installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value, default=_encode_default, option=_ORJSON_OPTIONS)
+    if isinstance(value, BaseModel):
+        return value.model_dump_json(by_alias=True).encode('utf-8')
+    if _needs_encoding(value):
+        value = jsonable_encoder(value)
+    return json.dumps(value).encode('utf-8')
+
 
 class OptimizedJSONResponse(JSONResponse):
     """Optimized JSON response with compression and caching headers"""
@@ -28,10 +156,15 @@ class OptimizedJSONResponse(JSONResponse):
         enable_compression: bool = True,
         cache_max_age: Optional[int] = None,
         etag: Optional[str] = None,
+        accept_encoding: Optional[str] = None,
     ):
-        # Convert to JSON-serializable format
-        if content is not None:
-            content = jsonable_encoder(content)
+        # Convert to JSON-serializable format; orjson encodes lazily in render()
+        # and already-primitive content is passed through untouched
+        if content is not None and not ORJSON_AVAILABLE:
+            if isinstance(content, BaseModel):
+                content = content.model_dump(mode="json", by_alias=True)
+            elif _needs_encoding(content):
+                content = jsonable_encoder(content)
         
         # Initialize headers
         if headers is None:
@@ -46,25 +179,70 @@ class OptimizedJSONResponse(JSONResponse):
         
         # Add performance headers
         headers["X-Content-Optimized"] = "true"
-        headers["X-Timestamp"] = datetime.now(timezone.utc).isoformat()
+        headers["X-Timestamp"] = _timestamp_header()
         
         super().__init__(content, status_code, headers, media_type)
         
-        # Apply compression if enabled and content is large enough
-        if enable_compression and content and len(self.body) > 1000:
-            self._apply_compression()
+        encoding = self._negotiate_encoding(enable_compression, content, accept_encoding)
+        if encoding:
+            self._apply_compression(encoding)
+    
+    @classmethod
+    async def abuild(
+        cls,
+        content: Any = None,
+        *,
+        enable_compression: bool = True,
+        accept_encoding: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "OptimizedJSONResponse":
+        """Build a response, compressing the body on the shared CPU pool
+        
+        Prefer this from async endpoints: large bodies are compressed off the
+        event loop instead of inside __init__.
+        """
+        response = cls(content, enable_compression=False, **kwargs)
+        encoding = response._negotiate_encoding(enable_compression, content, accept_encoding)
+        if encoding:
+            try:
+                compressed = await asyncio.get_running_loop().run_in_executor(
+                    _cpu_pool, _compress, response.body, encoding
+                )
+                response._use_compressed(compressed, encoding)
+            except Exception as e:
+                logger.warning(f"Compression failed: {e}")
+        return response
     
-    def _apply_compression(self):
-        """Apply gzip compression to response body"""
+    def render(self, content: Any) -> bytes:
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(content, default=_encode_default, option=_ORJSON_OPTIONS)
+        return super().render(content)
+    
+    def _negotiate_encoding(
+        self, enable_compression: bool, content: Any, accept_encoding: Optional[str]
+    ) -> Optional[str]:
+        """Pick a codec if compression is enabled and the body is large enough
+        
+        Without the client's Accept-Encoding header gzip is assumed.
+        """
+        if not (enable_compression and content and len(self.body) > 1000):
+            return None
+        self.headers["Vary"] = "Accept-Encoding"
+        return "gzip" if accept_encoding is None else choose_encoding(accept_encoding)
+    
+    def _apply_compression(self, encoding: str = "gzip"):
+        """Compress the response body with the negotiated codec"""
         try:
-            compressed = gzip.compress(self.body, compresslevel=6)
-            if len(compressed) < len(self.body):
-                self.body = compressed
-                self.headers["Content-Encoding"] = "gzip"
-                self.headers["Content-Length"] = str(len(compressed))
-                logger.debug(f"Response compressed: {len(self.body)} -> {len(compressed)} bytes")
+            self._use_compressed(_compress(self.body, encoding), encoding)
         except Exception as e:
             logger.warning(f"Compression failed: {e}")
+    
+    def _use_compressed(self, compressed: bytes, encoding: str):
+        if len(compressed) < len(self.body):
+            logger.debug(f"Response compressed ({encoding}): {len(self.body)} -> {len(compressed)} bytes")
+            self.body = compressed
+            self.headers["Content-Encoding"] = encoding
+            self.headers["Content-Length"] = str(len(compressed))
 
 
 class StreamingJSONResponse(StreamingResponse):
@@ -85,16 +263,16 @@ class StreamingJSONResponse(StreamingResponse):
         
         # Create streaming generator
         async def generate_stream():
-            yield '{"data": ['
+            yield b'{"data": ['
             first_item = True
             
             async for item in content:
                 if not first_item:
-                    yield ","
-                yield json.dumps(jsonable_encoder(item))
+                    yield b","
+                yield dumps_json_bytes(item)
                 first_item = False
             
-            yield "]}"
+            yield b"]}"
         
         super().__init__(generate_stream(), status_code, headers, media_type="application/json")
 
@@ -115,7 +293,21 @@ class PaginatedResponse:
         has_next = page < total_pages
         has_prev = page > 1
         
-        response = {
+        # base_url is user-supplied, so it is concatenated rather than used
+        # as a format template
+        prefix = f"{base_url}?page="
+        suffix = f"&page_size={page_size}"
+        links = {
+            "self": f"{prefix}{page}{suffix}",
+            "first": f"{prefix}1{suffix}",
+            "last": f"{prefix}{total_pages}{suffix}",
+        }
+        if has_next:
+            links["next"] = f"{prefix}{page + 1}{suffix}"
+        if has_prev:
+            links["prev"] = f"{prefix}{page - 1}{suffix}"
+        
+        return {
             "data": data,
             "pagination": {
                 "total": total,
@@ -125,61 +317,58 @@ class PaginatedResponse:
                 "has_next": has_next,
                 "has_prev": has_prev,
             },
-            "links": {
-                "self": f"{base_url}?page={page}&page_size={page_size}",
-                "first": f"{base_url}?page=1&page_size={page_size}",
-                "last": f"{base_url}?page={total_pages}&page_size={page_size}",
-            }
+            "links": links,
         }
-        
-        if has_next:
-            response["links"]["next"] = f"{base_url}?page={page + 1}&page_size={page_size}"
-        
-        if has_prev:
-            response["links"]["prev"] = f"{base_url}?page={page - 1}&page_size={page_size}"
-        
-        return response
 
 
 class ResponseCache:
-    """In-memory response cache for frequently requested data"""
+    """In-memory response cache for frequently requested data
     
-    def __init__(self, default_ttl: int = 300):
-        self.cache: Dict[str, Dict[str, Any]] = {}
+    Entries are (data, expires_ns, size) tuples keyed on time.monotonic_ns(),
+    held in LRU order and capped at max_entries. size is the sys.getsizeof
+    estimate of data, summed into _bytes as entries come and go.
+    """
+    
+    def __init__(self, default_ttl: int = 300, max_entries: int = 10_000):
+        self.cache: OrderedDict[Hashable, Tuple[Any, int, int]] = OrderedDict()
         self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._bytes = 0
     
-    def get(self, key: str) -> Optional[Any]:
+    def get(self, key: Hashable) -> Optional[Any]:
         """Get cached response"""
-        if key in self.cache:
-            entry = self.cache[key]
-            if datetime.now(timezone.utc) < entry["expires"]:
-                logger.debug(f"Cache hit: {key}")
-                return entry["data"]
-            else:
-                # Expired entry
-                del self.cache[key]
-                logger.debug(f"Cache expired: {key}")
+        entry = self.cache.get(key)
+        if entry is not None:
+            if entry[1] > time.monotonic_ns():
+                self.cache.move_to_end(key)
+                logger.debug("Cache hit: %s", key)
+                return entry[0]
+            # Expired entry
+            self.delete(key)
+            logger.debug("Cache expired: %s", key)
         
-        logger.debug(f"Cache miss: {key}")
+        logger.debug("Cache miss: %s", key)
         return None
     
-    def set(self, key: str, data: Any, ttl: Optional[int] = None) -> None:
+    def set(self, key: Hashable, data: Any, ttl: Optional[int] = None) -> None:
         """Set cached response"""
         ttl = ttl or self.default_ttl
-        expires = datetime.now(timezone.utc).timestamp() + ttl
-        
-        self.cache[key] = {
-            "data": data,
-            "expires": datetime.fromtimestamp(expires, timezone.utc),
-            "created": datetime.now(timezone.utc)
-        }
-        
-        logger.debug(f"Cache set: {key} (TTL: {ttl}s)")
+        size = sys.getsizeof(data)
+        old = self.cache.get(key)
+        if old is not None:
+            self._bytes -= old[2]
+        self.cache[key] = (data, time.monotonic_ns() + ttl * 1_000_000_000, size)
+        self._bytes += size
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.max_entries:
+            self._bytes -= self.cache.popitem(last=False)[1][2]
+        logger.debug("Cache set: %s (TTL: %ss)", key, ttl)
     
-    def delete(self, key: str) -> bool:
+    def delete(self, key: Hashable) -> bool:
         """Delete cached entry"""
-        if key in self.cache:
-            del self.cache[key]
+        entry = self.cache.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
             logger.debug(f"Cache deleted: {key}")
             return True
         return False
@@ -187,35 +376,35 @@ class ResponseCache:
     def clear(self) -> None:
         """Clear all cache entries"""
         self.cache.clear()
+        self._bytes = 0
         logger.info("Response cache cleared")
     
     def cleanup_expired(self) -> int:
         """Remove expired entries and return count"""
-        now = datetime.now(timezone.utc)
-        expired_keys = [
-            key for key, entry in self.cache.items()
-            if now >= entry["expires"]
-        ]
+        now = time.monotonic_ns()
+        before = len(self.cache)
+        self.cache = OrderedDict(
+            (key, entry) for key, entry in self.cache.items() if entry[1] > now
+        )
+        self._bytes = sum(entry[2] for entry in self.cache.values())
+        removed = before - len(self.cache)
         
-        for key in expired_keys:
-            del self.cache[key]
+        if removed:
+            logger.info(f"Cleaned up {removed} expired cache entries")
         
-        if expired_keys:
-            logger.info(f"Cleaned up {len(expired_keys)} expired cache entries")
-        
-        return len(expired_keys)
+        return removed
     
     def stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
-        now = datetime.now(timezone.utc)
-        active_entries = sum(1 for entry in self.cache.values() if now < entry["expires"])
+        now = time.monotonic_ns()
+        active_entries = sum(1 for entry in self.cache.values() if entry[1] > now)
         expired_entries = len(self.cache) - active_entries
         
         return {
             "total_entries": len(self.cache),
             "active_entries": active_entries,
             "expired_entries": expired_entries,
-            "memory_usage_mb": len(str(self.cache)) / (1024 * 1024),  # Rough estimate
+            "memory_usage_mb": self._bytes / (1024 * 1024),  # Shallow estimate
         }
 
 
@@ -225,8 +414,7 @@ class DataCompressor:
     @staticmethod
     def compress_json(data: Any, compression_level: int = 6) -> bytes:
         """Compress JSON data using gzip"""
-        json_str = json.dumps(jsonable_encoder(data))
-        return gzip.compress(json_str.encode('utf-8'), compresslevel=compression_level)
+        return gzip_bytes(dumps_json_bytes(data), compression_level)
     
     @staticmethod
     def should_compress(content_length: int, threshold: int = 1000) -> bool:
@@ -243,11 +431,17 @@ def cached_response(ttl: int = 300, key_func: Optional[callable] = None):
     """Decorator for caching responses"""
     def decorator(func):
         async def wrapper(*args, **kwargs):
-            # Generate cache key
+            # Generate cache key; kwargs are sorted so keyword order does not
+            # split equivalent calls across entries
             if key_func:
                 cache_key = key_func(*args, **kwargs)
             else:
-                cache_key = f"{func.__name__}:{str(args)}:{str(kwargs)}"
+                cache_key = (func.__qualname__, args, tuple(sorted(kwargs.items())))
+                try:
+                    hash(cache_key)
+                except TypeError:
+                    # Unhashable arguments fall back to their repr
+                    cache_key = f"{func.__qualname__}:{args!r}:{cache_key[2]!r}"
             
             # Try to get from cache
             cached_data = response_cache.get(cache_key)
@@ -268,21 +462,25 @@ async def stream_large_dataset(
     data_generator: AsyncGenerator[Any, None],
     chunk_size: int = 100
 ) -> AsyncGenerator[bytes, None]:
-    """Stream large datasets in chunks"""
-    yield b'{"data": ['
-    first = True
+    """Stream large datasets in chunks
+    
+    Items are encoded into one buffer and emitted chunk_size at a time, so
+    each ASGI body message carries a whole chunk rather than one item. The
+    consumer is assumed to be a StreamingResponse: its awaited send() of each
+    chunk is the cooperative yield point and applies transport backpressure.
+    """
+    buf = bytearray(b'{"data": [')
     count = 0
     
     async for item in data_generator:
-        if not first:
-            yield b","
-        
-        yield json.dumps(jsonable_encoder(item)).encode('utf-8')
-        first = False
+        if count:
+            buf += b","
+        buf += dumps_json_bytes(item)
         count += 1
         
-        # Yield control every chunk_size items
         if count % chunk_size == 0:
-            await asyncio.sleep(0)  # Allow other tasks to run
+            yield bytes(buf)
+            buf.clear()
     
-    yield b"]}"
\ No newline at end of file
+    buf += b"]}"
+    yield bytes(buf)
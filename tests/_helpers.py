@@ -0,0 +1,46 @@
+"""
+Test helpers with no application imports
+"""
+
+import json
+from typing import Any
+
+from sqlalchemy import event, insert
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+def rjson(response) -> Any:
+    """Decode a response body straight from its bytes, with orjson when installed"""
+    return _loads(response.content)
+
+
+def enable_sqlite_savepoints(engine):
+    """Let SQLAlchemy emit BEGIN itself so SAVEPOINT works under pysqlite
+
+    pysqlite manages transactions itself and breaks SAVEPOINT; with this each
+    test can run inside a rolled-back outer transaction.
+    """
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
+def bulk_insert(session, model, rows: list[dict]) -> list:
+    """Insert rows with one Core executemany instead of N API calls
+
+    Rows use model values (enum strings, datetime objects) rather than
+    request JSON. Returns the new ids in row order.
+    """
+    stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+    ids = session.scalars(stmt, rows).all()
+    session.commit()
+    return ids
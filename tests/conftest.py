@@ -2,14 +2,18 @@
 Test configuration and fixtures
 """
 
+from datetime import datetime, timedelta
+
 import pytest
-from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from fastapi_todo_app.main import app
-from fastapi_todo_app.db.database import Base, get_db
+from fastapi_todo_app.domains.todos.db.database import Base, get_db
+from fastapi_todo_app.domains.todos.models import Todo
+from tests._helpers import bulk_insert, enable_sqlite_savepoints
 
 # Create test database
 SQLALCHEMY_DATABASE_URL = "sqlite://"
@@ -21,27 +25,85 @@ engine = create_engine(
     },
     poolclass=StaticPool,
 )
+# Each test runs inside a rolled-back outer transaction
+enable_sqlite_savepoints(engine)
+
+
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="session")
+def database_schema():
+    """Create the schema once for the whole test session"""
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
 
 
-def override_get_db():
-    """Override database dependency for testing"""
+@pytest.fixture
+def db_session(database_schema):
+    """Session whose work is rolled back when the test ends
+
+    Application commits only release a SAVEPOINT inside the outer
+    transaction, so no rows outlive the test and no DDL runs between tests.
+    """
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = TestingSessionLocal(bind=connection, join_transaction_mode="create_savepoint")
     try:
-        db = TestingSessionLocal()
-        yield db
+        yield session
     finally:
-        db.close()
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture(scope="session")
+def future_iso():
+    """A due date a week from session start, as request JSON"""
+    return (datetime.now() + timedelta(days=7)).isoformat()
+
+
+@pytest.fixture(scope="session")
+def past_due_date():
+    """A due date one day before session start, as a model value"""
+    return datetime.now() - timedelta(days=1)
 
 
 @pytest.fixture
-def client():
-    """Create test client with test database"""
-    Base.metadata.create_all(bind=engine)
-    app.dependency_overrides[get_db] = override_get_db
-    
-    with TestClient(app) as test_client:
+def seed_todos(db_session):
+    """Insert todo rows directly with one Core executemany, bypassing the API
+
+    For tests that only need data present; rows use model values (enum
+    strings, datetime objects) rather than request JSON. Returns the new
+    ids in row order.
+    """
+    def seed(rows):
+        return bulk_insert(db_session, Todo, rows)
+    return seed
+
+
+@pytest.fixture(scope="session")
+async def _client():
+    """One in-process async client shared by the whole session
+
+    ASGITransport calls the app directly on the event loop, with no portal
+    thread per request as with TestClient.
+    """
+    transport = ASGITransport(app=app)
+    async with AsyncClient(
+        transport=transport, base_url="http://test", follow_redirects=True
+    ) as test_client:
         yield test_client
-    
+
+
+@pytest.fixture
+def client(_client, db_session):
+    """Shared test client with the database overridden for this test"""
+    def override_get_db():
+        """Override database dependency for testing"""
+        yield db_session
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield _client
     app.dependency_overrides.clear()
-    Base.metadata.drop_all(bind=engine)
\ No newline at end of file
@@ -3,17 +3,23 @@ Enhanced test cases for Pydantic-powered Todo API endpoints
 """
 
 import pytest
-from datetime import datetime, timedelta
 from fastapi import status
-from fastapi.testclient import TestClient
+from httpx import AsyncClient
 
-from fastapi_todo_app.schemas.todo import TodoPriority, TodoStatus
+from fastapi_todo_app.domains.todos.schemas.todo import TodoPriority, TodoStatus
+from tests._helpers import rjson
+
+_EXPECTED_TODO_FIELDS = frozenset({
+    "id", "title", "description", "completed", "priority",
+    "status", "due_date", "tags", "created_at", "updated_at"
+})
+_PRIORITY_VALUES = frozenset({"low", "medium", "high", "urgent"})
 
 
 class TestEnhancedTodoAPI:
     """Test class for enhanced Todo API with Pydantic models"""
 
-    def test_create_todo_with_pydantic_validation(self, client: TestClient):
+    async def test_create_todo_with_pydantic_validation(self, client: AsyncClient, future_iso):
         """Test creating a new todo with Pydantic validation"""
         todo_data = {
             "title": "Test Todo with Pydantic",
@@ -21,14 +27,14 @@ class TestEnhancedTodoAPI:
             "completed": False,
             "priority": "high",
             "status": "pending",
-            "due_date": (datetime.now() + timedelta(days=7)).isoformat(),
+            "due_date": future_iso,
             "tags": ["test", "pydantic", "fastapi"]
         }
         
-        response = client.post("/api/v1/todos/", json=todo_data)
+        response = await client.post("/api/v1/todos/", json=todo_data)
         
         assert response.status_code == status.HTTP_201_CREATED
-        data = response.json()
+        data = rjson(response)
         assert data["title"] == todo_data["title"]
         assert data["description"] == todo_data["description"]
         assert data["priority"] == todo_data["priority"]
@@ -37,7 +43,7 @@ class TestEnhancedTodoAPI:
         assert "id" in data
         assert "created_at" in data
 
-    def test_create_todo_validation_errors(self, client: TestClient):
+    async def test_create_todo_validation_errors(self, client: AsyncClient):
         """Test Pydantic validation errors"""
         # Test empty title
         todo_data = {
@@ -45,7 +51,7 @@ class TestEnhancedTodoAPI:
             "description": "This should fail"
         }
         
-        response = client.post("/api/v1/todos/", json=todo_data)
+        response = await client.post("/api/v1/todos/", json=todo_data)
         assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
         
         # Test title too long
@@ -54,10 +60,10 @@ class TestEnhancedTodoAPI:
             "description": "This should also fail"
         }
         
-        response = client.post("/api/v1/todos/", json=todo_data)
+        response = await client.post("/api/v1/todos/", json=todo_data)
         assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
-    def test_get_todos_with_enhanced_filtering(self, client: TestClient):
+    async def test_get_todos_with_enhanced_filtering(self, client: AsyncClient, seed_todos):
         """Test getting todos with enhanced filtering"""
         # Create test todos with different properties
         todos = [
@@ -83,40 +89,42 @@ class TestEnhancedTodoAPI:
         ]
         
         # Create all todos
-        for todo in todos:
-            client.post("/api/v1/todos/", json=todo)
+        seed_todos(todos)
         
         # Test filtering by priority
-        response = client.get("/api/v1/todos/?priority=high")
+        response = await client.get("/api/v1/todos/?priority=high")
         assert response.status_code == status.HTTP_200_OK
-        data = response.json()
+        data = rjson(response)
         assert len(data["todos"]) == 1
         assert data["todos"][0]["priority"] == "high"
         
         # Test filtering by status
-        response = client.get("/api/v1/todos/?status=completed")
+        response = await client.get("/api/v1/todos/?status=completed")
         assert response.status_code == status.HTTP_200_OK
-        data = response.json()
+        data = rjson(response)
         assert len(data["todos"]) == 1
         assert data["todos"][0]["status"] == "completed"
 
-    def test_todo_stats_endpoint(self, client: TestClient):
+    async def test_todo_stats_endpoint(self, client: AsyncClient):
         """Test the todo statistics endpoint"""
         # Create some test todos
-        client.post("/api/v1/todos/", json={"title": "Todo 1", "completed": False})
-        client.post("/api/v1/todos/", json={"title": "Todo 2", "completed": True})
+        response = await client.post("/api/v1/todos/bulk", json=[
+            {"title": "Todo 1", "completed": False},
+            {"title": "Todo 2", "completed": True},
+        ])
+        assert response.status_code == status.HTTP_201_CREATED
         
-        response = client.get("/api/v1/todos/stats")
+        response = await client.get("/api/v1/todos/stats")
         assert response.status_code == status.HTTP_200_OK
         
-        data = response.json()
+        data = rjson(response)
         assert "total_todos" in data
         assert "completed_todos" in data
         assert "pending_todos" in data
         assert "completion_rate" in data
-        assert data["total_todos"] >= 2
+        assert data["total_todos"] == 2
 
-    def test_bulk_operations(self, client: TestClient):
+    async def test_bulk_operations(self, client: AsyncClient, seed_todos):
         """Test bulk operations"""
         # Create multiple todos
         todos = [
@@ -125,14 +133,8 @@ class TestEnhancedTodoAPI:
             {"title": "Bulk Todo 3", "priority": "high"}
         ]
         
-        response = client.post("/api/v1/todos/bulk", json=todos)
-        assert response.status_code == status.HTTP_201_CREATED
-        
-        data = response.json()
-        assert len(data) == 3
-        
-        # Get the created todo IDs
-        todo_ids = [todo["id"] for todo in data]
+        todo_ids = seed_todos(todos)
+        assert len(todo_ids) == 3
         
         # Test bulk status update
         bulk_update_data = {
@@ -140,18 +142,18 @@ class TestEnhancedTodoAPI:
             "status": "completed"
         }
         
-        response = client.patch("/api/v1/todos/bulk-status", json=bulk_update_data)
+        response = await client.patch("/api/v1/todos/bulk-status", json=bulk_update_data)
         assert response.status_code == status.HTTP_200_OK
         
-        updated_todos = response.json()
+        updated_todos = rjson(response)
         assert len(updated_todos) == 3
         for todo in updated_todos:
             assert todo["status"] == "completed"
 
-    def test_advanced_search(self, client: TestClient):
+    async def test_advanced_search(self, client: AsyncClient):
         """Test advanced search functionality"""
         # Create todos with searchable content
-        client.post("/api/v1/todos/", json={
+        await client.post("/api/v1/todos/", json={
             "title": "Python FastAPI Development",
             "description": "Working on FastAPI project with Pydantic",
             "tags": ["python", "development"]
@@ -163,61 +165,58 @@ class TestEnhancedTodoAPI:
             "tags": ["python"]
         }
         
-        response = client.post("/api/v1/todos/search", json=search_filters)
+        response = await client.post("/api/v1/todos/search", json=search_filters)
         assert response.status_code == status.HTTP_200_OK
         
-        data = response.json()
-        assert len(data["todos"]) >= 1
+        data = rjson(response)
+        assert len(data["todos"]) == 1
 
-    def test_priority_filtering(self, client: TestClient):
+    async def test_priority_filtering(self, client: AsyncClient, seed_todos):
         """Test filtering todos by priority"""
         # Create todos with different priorities
-        client.post("/api/v1/todos/", json={"title": "Urgent Task", "priority": "urgent"})
+        seed_todos([{"title": "Urgent Task", "priority": "urgent"}])
         
-        response = client.get("/api/v1/todos/priority/urgent")
+        response = await client.get("/api/v1/todos/priority/urgent")
         assert response.status_code == status.HTTP_200_OK
         
-        data = response.json()
-        assert len(data) >= 1
-        for todo in data:
-            assert todo["priority"] == "urgent"
+        data = rjson(response)
+        assert len(data) == 1
+        assert data[0]["priority"] == "urgent"
 
-    def test_status_filtering(self, client: TestClient):
+    async def test_status_filtering(self, client: AsyncClient, seed_todos):
         """Test filtering todos by status"""
         # Create a todo with specific status
-        client.post("/api/v1/todos/", json={"title": "In Progress Task", "status": "in_progress"})
+        seed_todos([{"title": "In Progress Task", "status": "in_progress"}])
         
-        response = client.get("/api/v1/todos/status/in_progress")
+        response = await client.get("/api/v1/todos/status/in_progress")
         assert response.status_code == status.HTTP_200_OK
         
-        data = response.json()
-        assert len(data) >= 1
-        for todo in data:
-            assert todo["status"] == "in_progress"
+        data = rjson(response)
+        assert len(data) == 1
+        assert data[0]["status"] == "in_progress"
 
-    def test_overdue_todos(self, client: TestClient):
+    async def test_overdue_todos(self, client: AsyncClient, seed_todos, past_due_date):
         """Test getting overdue todos"""
         # Create an overdue todo
-        past_date = (datetime.now() - timedelta(days=1)).isoformat()
-        client.post("/api/v1/todos/", json={
+        seed_todos([{
             "title": "Overdue Task",
-            "due_date": past_date,
+            "due_date": past_due_date,
             "completed": False
-        })
+        }])
         
-        response = client.get("/api/v1/todos/overdue")
+        response = await client.get("/api/v1/todos/overdue")
         assert response.status_code == status.HTTP_200_OK
         
-        data = response.json()
-        # Should have at least the overdue todo we just created
-        overdue_todos = [todo for todo in data if not todo["completed"]]
-        assert len(overdue_todos) >= 1
+        data = rjson(response)
+        # Only the overdue todo we just created exists
+        assert len(data) == 1
+        assert data[0]["completed"] is False
 
-    def test_pydantic_model_validation_in_updates(self, client: TestClient):
+    async def test_pydantic_model_validation_in_updates(self, client: AsyncClient):
         """Test Pydantic validation during updates"""
         # Create a todo
-        create_response = client.post("/api/v1/todos/", json={"title": "Update Test"})
-        todo_id = create_response.json()["id"]
+        create_response = await client.post("/api/v1/todos/", json={"title": "Update Test"})
+        todo_id = rjson(create_response)["id"]
         
         # Test valid update
         update_data = {
@@ -226,15 +225,15 @@ class TestEnhancedTodoAPI:
             "tags": ["updated", "test"]
         }
         
-        response = client.put(f"/api/v1/todos/{todo_id}", json=update_data)
+        response = await client.put(f"/api/v1/todos/{todo_id}", json=update_data)
         assert response.status_code == status.HTTP_200_OK
         
-        data = response.json()
+        data = rjson(response)
         assert data["title"] == update_data["title"]
         assert data["priority"] == update_data["priority"]
         assert data["tags"] == update_data["tags"]
 
-    def test_enhanced_todo_response_structure(self, client: TestClient):
+    async def test_enhanced_todo_response_structure(self, client: AsyncClient):
         """Test the enhanced TodoResponse Pydantic model structure"""
         todo_data = {
             "title": "Complete Response Test",
@@ -244,24 +243,18 @@ class TestEnhancedTodoAPI:
             "tags": ["response", "test"]
         }
         
-        response = client.post("/api/v1/todos/", json=todo_data)
+        response = await client.post("/api/v1/todos/", json=todo_data)
         assert response.status_code == status.HTTP_201_CREATED
         
-        data = response.json()
+        data = rjson(response)
         
         # Verify all expected fields are present
-        expected_fields = [
-            "id", "title", "description", "completed", "priority", 
-            "status", "due_date", "tags", "created_at", "updated_at"
-        ]
-        
-        for field in expected_fields:
-            assert field in data
+        assert _EXPECTED_TODO_FIELDS <= data.keys()
         
         # Verify data types and values
         assert isinstance(data["id"], int)
         assert isinstance(data["title"], str)
         assert isinstance(data["completed"], bool)
         assert isinstance(data["tags"], list)
-        assert data["priority"] in ["low", "medium", "high", "urgent"]
+        assert data["priority"] in _PRIORITY_VALUES
         assert data["status"] in ["pending", "in_progress", "completed", "cancelled"]
\ No newline at end of file
@@ -4,84 +4,110 @@ Comprehensive Testing Framework for FastAPI TODO Application
 
 import pytest
 import asyncio
-import json
-from typing import Dict, Any, Generator
-from httpx import AsyncClient
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, Generator
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-import tempfile
-import os
+from sqlalchemy.pool import StaticPool
+
+from tests._helpers import bulk_insert, enable_sqlite_savepoints, rjson
 
 # Import application components
 from src.fastapi_todo_app.main import app
 from src.fastapi_todo_app.shared.core.config import settings
 from src.fastapi_todo_app.domains.todos.db.database import Base as TodoBase, get_db as get_todo_db
+from src.fastapi_todo_app.domains.todos.models import Todo
 from src.fastapi_todo_app.domains.employees.db.database import Base as EmployeeBase, get_db as get_employee_db
 
 
 class TestDatabaseManager:
-    """Manages test database lifecycle"""
+    """Manages test database lifecycle
+    
+    One in-memory engine hosts both the todo and employee schemas, created
+    once per session. Each test runs inside an outer transaction that is
+    rolled back afterwards; application commits only release SAVEPOINTs, so
+    every test starts from empty tables.
+    """
     
     def __init__(self):
-        self.todo_engine = None
-        self.employee_engine = None
-        self.todo_session = None
-        self.employee_session = None
+        self.engine = None
+        self.session = None
+        self._connection = None
+        self._transaction = None
     
     def setup_test_databases(self):
         """Setup test databases"""
-        # Create temporary database files
-        self.todo_db_file = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
-        self.employee_db_file = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
-        
-        # Create engines
-        self.todo_engine = create_engine(
-            f"sqlite:///{self.todo_db_file.name}",
-            connect_args={"check_same_thread": False}
-        )
-        self.employee_engine = create_engine(
-            f"sqlite:///{self.employee_db_file.name}",
-            connect_args={"check_same_thread": False}
+        # StaticPool keeps the in-memory database on a single connection
+        self.engine = create_engine(
+            "sqlite:///:memory:",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
         )
+        enable_sqlite_savepoints(self.engine)
+        
+        # Durability is irrelevant for tests: never fsync, keep journals in RAM
+        @event.listens_for(self.engine, "connect")
+        def _fast_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA synchronous=OFF")
+            cursor.execute("PRAGMA journal_mode=MEMORY")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.close()
         
-        # Create tables
-        TodoBase.metadata.create_all(bind=self.todo_engine)
-        EmployeeBase.metadata.create_all(bind=self.employee_engine)
+        # Create tables for both domains
+        TodoBase.metadata.create_all(bind=self.engine)
+        EmployeeBase.metadata.create_all(bind=self.engine)
         
-        # Create sessions
-        TodoSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.todo_engine)
-        EmployeeSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.employee_engine)
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False)
+    
+    # Both domains share the one per-test session
+    @property
+    def todo_session(self):
+        return self.session
+    
+    @property
+    def employee_session(self):
+        return self.session
+    
+    def begin_test(self):
+        """Open the per-test transaction and session"""
+        self._connection = self.engine.connect()
+        self._transaction = self._connection.begin()
+        self.session = self.session_factory(
+            bind=self._connection, join_transaction_mode="create_savepoint"
+        )
+    
+    def end_test(self):
+        """Roll back everything the test wrote"""
+        if self.session:
+            self.session.close()
+            self.session = None
+        if self._connection:
+            self._transaction.rollback()
+            self._connection.close()
+            self._connection = self._transaction = None
+    
+    def bulk_seed_todos(self, rows: list[dict]):
+        """Insert todo rows with one Core executemany instead of N API calls
         
-        self.todo_session = TodoSessionLocal()
-        self.employee_session = EmployeeSessionLocal()
+        Returns the new ids in row order.
+        """
+        return bulk_insert(self.todo_session, Todo, rows)
     
     def get_test_todo_db(self):
         """Get test todo database session"""
-        try:
-            yield self.todo_session
-        finally:
-            self.todo_session.close()
+        yield self.todo_session
     
     def get_test_employee_db(self):
         """Get test employee database session"""
-        try:
-            yield self.employee_session
-        finally:
-            self.employee_session.close()
+        yield self.employee_session
     
     def cleanup(self):
         """Clean up test databases"""
-        if self.todo_session:
-            self.todo_session.close()
-        if self.employee_session:
-            self.employee_session.close()
-        
-        # Remove temporary files
-        if hasattr(self, 'todo_db_file'):
-            os.unlink(self.todo_db_file.name)
-        if hasattr(self, 'employee_db_file'):
-            os.unlink(self.employee_db_file.name)
+        self.end_test()
+        self.engine.dispose()
 
 
 @pytest.fixture(scope="session")
@@ -93,30 +119,35 @@ def test_db_manager():
     manager.cleanup()
 
 
+@pytest.fixture(scope="session")
+async def _client():
+    """Async in-process test client, created once per session"""
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test", follow_redirects=True
+    ) as ac:
+        yield ac
+
+
 @pytest.fixture
 def test_app(test_db_manager):
     """Test application with database overrides"""
+    test_db_manager.begin_test()
+    
     # Override database dependencies
     app.dependency_overrides[get_todo_db] = test_db_manager.get_test_todo_db
     app.dependency_overrides[get_employee_db] = test_db_manager.get_test_employee_db
     
     yield app
     
-    # Clear overrides
+    # Clear overrides and discard the test's writes
     app.dependency_overrides.clear()
+    test_db_manager.end_test()
 
 
 @pytest.fixture
-def client(test_app):
-    """Test client fixture"""
-    return TestClient(test_app)
-
-
-@pytest.fixture
-async def async_client(test_app):
-    """Async test client fixture"""
-    async with AsyncClient(app=test_app, base_url="http://testserver") as ac:
-        yield ac
+def client(_client, test_app):
+    """Shared test client with this test's database overrides applied"""
+    return _client
 
 
 # Test Data Fixtures
@@ -145,40 +176,37 @@ def sample_employee_data():
 
 
 # Performance Testing
+_VERBS = {"GET": "get", "POST": "post", "PUT": "put", "PATCH": "patch", "DELETE": "delete"}
+
+
 class PerformanceTest:
     """Performance testing utilities"""
     
     @staticmethod
     async def measure_response_time(client: AsyncClient, method: str, url: str, **kwargs) -> float:
         """Measure response time for an API call"""
-        import time
-        start_time = time.time()
-        
-        if method.upper() == 'GET':
-            response = await client.get(url, **kwargs)
-        elif method.upper() == 'POST':
-            response = await client.post(url, **kwargs)
-        elif method.upper() == 'PUT':
-            response = await client.put(url, **kwargs)
-        elif method.upper() == 'DELETE':
-            response = await client.delete(url, **kwargs)
+        send = getattr(client, _VERBS[method.upper()])
         
-        end_time = time.time()
-        response_time = end_time - start_time
+        start = time.perf_counter_ns()
+        response = await send(url, **kwargs)
+        response_time = (time.perf_counter_ns() - start) / 1e9
         
         return response_time, response
     
     @staticmethod
     async def load_test(client: AsyncClient, method: str, url: str, concurrent_requests: int = 10, **kwargs):
-        """Perform load testing"""
-        import asyncio
+        """Perform load testing
         
+        Pass the shared session-scoped ``client`` fixture rather than a new
+        AsyncClient, so every request in the fan-out reuses one client.
+        """
         async def single_request():
             return await PerformanceTest.measure_response_time(client, method, url, **kwargs)
         
-        # Run concurrent requests
-        tasks = [single_request() for _ in range(concurrent_requests)]
-        results = await asyncio.gather(*tasks)
+        # Run concurrent requests; a failure cancels the rest of the batch
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(single_request()) for _ in range(concurrent_requests)]
+        results = [task.result() for task in tasks]
         
         response_times = [result[0] for result in results]
         responses = [result[1] for result in results]
@@ -194,31 +222,36 @@ class PerformanceTest:
 
 
 # Security Testing
+_SQL_INJECTION_PAYLOADS: tuple[str, ...] = (
+    "' OR '1'='1",
+    "'; DROP TABLE todos; --",
+    "' UNION SELECT * FROM users --",
+    "1' OR 1=1 --",
+    "admin'/*",
+    "' OR 'x'='x",
+)
+
+_XSS_PAYLOADS: tuple[str, ...] = (
+    "<script>alert('XSS')</script>",
+    "javascript:alert('XSS')",
+    "<img src=x onerror=alert('XSS')>",
+    "<svg onload=alert('XSS')>",
+    "';alert('XSS');//",
+)
+
+
 class SecurityTest:
     """Security testing utilities"""
     
     @staticmethod
     def test_sql_injection_payloads():
         """Common SQL injection payloads"""
-        return [
-            "' OR '1'='1",
-            "'; DROP TABLE todos; --",
-            "' UNION SELECT * FROM users --",
-            "1' OR 1=1 --",
-            "admin'/*",
-            "' OR 'x'='x",
-        ]
+        return _SQL_INJECTION_PAYLOADS
     
     @staticmethod
     def test_xss_payloads():
         """Common XSS payloads"""
-        return [
-            "<script>alert('XSS')</script>",
-            "javascript:alert('XSS')",
-            "<img src=x onerror=alert('XSS')>",
-            "<svg onload=alert('XSS')>",
-            "';alert('XSS');//",
-        ]
+        return _XSS_PAYLOADS
     
     @staticmethod
     async def test_unauthorized_access(client: AsyncClient, protected_endpoints: list):
@@ -267,6 +300,20 @@ class ValidationTest:
 class IntegrationTestBase:
     """Base class for integration tests"""
     
+    @asynccontextmanager
+    async def integration_data(self, client: AsyncClient) -> AsyncIterator[Dict[str, Any]]:
+        """Create the integration fixtures and always clean them up
+        
+        Setup and cleanup run on the same client. Requests are issued one
+        at a time: both domains share the test's single SQLAlchemy session,
+        which must not be used by concurrent requests.
+        """
+        test_data = await self.setup_test_data(client)
+        try:
+            yield test_data
+        finally:
+            await self.cleanup_test_data(client, test_data)
+    
     async def setup_test_data(self, client: AsyncClient) -> Dict[str, Any]:
         """Setup test data for integration tests"""
         test_data = {}
@@ -280,7 +327,7 @@ class IntegrationTestBase:
         
         todo_response = await client.post("/api/v1/todos", json=todo_data)
         if todo_response.status_code == 201:
-            test_data['todo'] = todo_response.json()
+            test_data['todo'] = rjson(todo_response)
         
         # Create test Employee
         employee_data = {
@@ -292,7 +339,7 @@ class IntegrationTestBase:
         
         employee_response = await client.post("/api/v1/employees", json=employee_data)
         if employee_response.status_code == 201:
-            test_data['employee'] = employee_response.json()
+            test_data['employee'] = rjson(employee_response)
         
         return test_data
     
@@ -319,6 +366,7 @@ pytest.mark.slow = pytest.mark.slow
 
 # Export test utilities
 __all__ = [
+    'rjson',
     'TestDatabaseManager',
     'PerformanceTest',
     'SecurityTest',
@@ -4,13 +4,15 @@ Test cases for Todo API endpoints
 
 import pytest
 from fastapi import status
-from fastapi.testclient import TestClient
+from httpx import AsyncClient
+
+from tests._helpers import rjson
 
 
 class TestTodoAPI:
     """Test class for Todo API endpoints"""
 
-    def test_create_todo(self, client: TestClient):
+    async def test_create_todo(self, client: AsyncClient):
         """Test creating a new todo"""
         todo_data = {
             "title": "Test Todo",
@@ -18,103 +20,103 @@ class TestTodoAPI:
             "completed": False
         }
         
-        response = client.post("/api/v1/todos/", json=todo_data)
+        response = await client.post("/api/v1/todos/", json=todo_data)
         
         assert response.status_code == status.HTTP_201_CREATED
-        data = response.json()
+        data = rjson(response)
         assert data["title"] == todo_data["title"]
         assert data["description"] == todo_data["description"]
         assert data["completed"] == todo_data["completed"]
         assert "id" in data
         assert "created_at" in data
 
-    def test_get_todos(self, client: TestClient):
+    async def test_get_todos(self, client: AsyncClient):
         """Test getting list of todos"""
         # First create a todo
         todo_data = {
             "title": "Test Todo",
             "description": "This is a test todo"
         }
-        client.post("/api/v1/todos/", json=todo_data)
+        await client.post("/api/v1/todos/", json=todo_data)
         
         # Get todos
-        response = client.get("/api/v1/todos/")
+        response = await client.get("/api/v1/todos/")
         
         assert response.status_code == status.HTTP_200_OK
-        data = response.json()
+        data = rjson(response)
         assert "todos" in data
         assert "total" in data
         assert "page" in data
         assert "size" in data
         assert len(data["todos"]) == 1
 
-    def test_get_todo_by_id(self, client: TestClient):
+    async def test_get_todo_by_id(self, client: AsyncClient):
         """Test getting a specific todo by ID"""
         # Create a todo
         todo_data = {
             "title": "Test Todo",
             "description": "This is a test todo"
         }
-        create_response = client.post("/api/v1/todos/", json=todo_data)
-        created_todo = create_response.json()
+        create_response = await client.post("/api/v1/todos/", json=todo_data)
+        created_todo = rjson(create_response)
         
         # Get the todo by ID
-        response = client.get(f"/api/v1/todos/{created_todo['id']}")
+        response = await client.get(f"/api/v1/todos/{created_todo['id']}")
         
         assert response.status_code == status.HTTP_200_OK
-        data = response.json()
+        data = rjson(response)
         assert data["id"] == created_todo["id"]
         assert data["title"] == todo_data["title"]
 
-    def test_get_nonexistent_todo(self, client: TestClient):
+    async def test_get_nonexistent_todo(self, client: AsyncClient):
         """Test getting a nonexistent todo"""
-        response = client.get("/api/v1/todos/999")
+        response = await client.get("/api/v1/todos/999")
         
         assert response.status_code == status.HTTP_404_NOT_FOUND
 
-    def test_update_todo(self, client: TestClient):
+    async def test_update_todo(self, client: AsyncClient):
         """Test updating a todo"""
         # Create a todo
         todo_data = {
             "title": "Test Todo",
             "description": "This is a test todo"
         }
-        create_response = client.post("/api/v1/todos/", json=todo_data)
-        created_todo = create_response.json()
+        create_response = await client.post("/api/v1/todos/", json=todo_data)
+        created_todo = rjson(create_response)
         
         # Update the todo
         update_data = {
             "title": "Updated Todo",
             "completed": True
         }
-        response = client.put(f"/api/v1/todos/{created_todo['id']}", json=update_data)
+        response = await client.put(f"/api/v1/todos/{created_todo['id']}", json=update_data)
         
         assert response.status_code == status.HTTP_200_OK
-        data = response.json()
+        data = rjson(response)
         assert data["title"] == update_data["title"]
         assert data["completed"] == update_data["completed"]
         assert data["description"] == todo_data["description"]  # Should remain unchanged
 
-    def test_delete_todo(self, client: TestClient):
+    async def test_delete_todo(self, client: AsyncClient):
         """Test deleting a todo"""
         # Create a todo
         todo_data = {
             "title": "Test Todo",
             "description": "This is a test todo"
         }
-        create_response = client.post("/api/v1/todos/", json=todo_data)
-        created_todo = create_response.json()
+        create_response = await client.post("/api/v1/todos/", json=todo_data)
+        created_todo = rjson(create_response)
         
         # Delete the todo
-        response = client.delete(f"/api/v1/todos/{created_todo['id']}")
+        response = await client.delete(f"/api/v1/todos/{created_todo['id']}")
         
         assert response.status_code == status.HTTP_204_NO_CONTENT
         
         # Verify it's deleted
-        get_response = client.get(f"/api/v1/todos/{created_todo['id']}")
+        get_response = await client.get(f"/api/v1/todos/{created_todo['id']}")
         assert get_response.status_code == status.HTTP_404_NOT_FOUND
 
-    def test_complete_todo(self, client: TestClient):
+    async def test_complete_todo(self, client: AsyncClient):
         """Test marking a todo as completed"""
         # Create a todo
         todo_data = {
@@ -122,17 +124,17 @@ class TestTodoAPI:
             "description": "This is a test todo",
             "completed": False
         }
-        create_response = client.post("/api/v1/todos/", json=todo_data)
-        created_todo = create_response.json()
+        create_response = await client.post("/api/v1/todos/", json=todo_data)
+        created_todo = rjson(create_response)
         
         # Complete the todo
-        response = client.patch(f"/api/v1/todos/{created_todo['id']}/complete")
+        response = await client.patch(f"/api/v1/todos/{created_todo['id']}/complete")
         
         assert response.status_code == status.HTTP_200_OK
-        data = response.json()
+        data = rjson(response)
         assert data["completed"] == True
 
-    def test_uncomplete_todo(self, client: TestClient):
+    async def test_uncomplete_todo(self, client: AsyncClient):
         """Test marking a completed todo as not completed"""
         # Create a completed todo
         todo_data = {
@@ -140,32 +142,34 @@ class TestTodoAPI:
             "description": "This is a test todo",
             "completed": True
         }
-        create_response = client.post("/api/v1/todos/", json=todo_data)
-        created_todo = create_response.json()
+        create_response = await client.post("/api/v1/todos/", json=todo_data)
+        created_todo = rjson(create_response)
         
         # Uncomplete the todo
-        response = client.patch(f"/api/v1/todos/{created_todo['id']}/uncomplete")
+        response = await client.patch(f"/api/v1/todos/{created_todo['id']}/uncomplete")
         
         assert response.status_code == status.HTTP_200_OK
-        data = response.json()
+        data = rjson(response)
         assert data["completed"] == False
 
-    def test_get_todos_with_filter(self, client: TestClient):
+    async def test_get_todos_with_filter(self, client: AsyncClient, seed_todos):
         """Test getting todos with completed filter"""
         # Create completed and uncompleted todos
-        client.post("/api/v1/todos/", json={"title": "Completed Todo", "completed": True})
-        client.post("/api/v1/todos/", json={"title": "Incomplete Todo", "completed": False})
+        seed_todos([
+            {"title": "Completed Todo", "completed": True},
+            {"title": "Incomplete Todo", "completed": False},
+        ])
         
         # Get only completed todos
-        response = client.get("/api/v1/todos/?completed=true")
+        response = await client.get("/api/v1/todos/?completed=true")
         assert response.status_code == status.HTTP_200_OK
-        data = response.json()
+        data = rjson(response)
         assert data["total"] == 1
         assert data["todos"][0]["completed"] == True
         
         # Get only incomplete todos
-        response = client.get("/api/v1/todos/?completed=false")
+        response = await client.get("/api/v1/todos/?completed=false")
         assert response.status_code == status.HTTP_200_OK
-        data = response.json()
+        data = rjson(response)
         assert data["total"] == 1
         assert data["todos"][0]["completed"] == False
\ No newline at end of file